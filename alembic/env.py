@@ -4,7 +4,7 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 
-from models.user import User
+import models  # noqa: F401  registers every table on Base.metadata
 
 from core.setup import Base
 from config.setting import app_settings
@@ -0,0 +1,89 @@
+"""purchase path indexes
+
+Indexes for voucher allocation, per-user listings, the reservation sweeper
+and username logins. Databases created by ``create_all`` before the
+reservation columns existed get those columns too. Every step checks the
+live schema first, so this also runs cleanly on databases that
+``create_all`` has already brought up to date.
+
+Revision ID: 9c2d4e6f8a01
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2d4e6f8a01'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FREE = "is_used = false AND is_reserved IS NOT true"
+HELD = "is_used = false AND is_reserved = true"
+
+# name, table, columns, partial index predicate
+INDEXES = [
+    ("ix_vouchers_amount_is_used", "vouchers", ["amount", "is_used"], None),
+    ("ix_vouchers_user_id_is_used_amount", "vouchers", ["user_id", "is_used", "amount"], None),
+    ("ix_vouchers_free_amount_id", "vouchers", ["amount", "id"], FREE),
+    ("ix_vouchers_held_reserved_until", "vouchers", ["reserved_until"], HELD),
+    ("ix_users_username", "users", ["username"], None),
+]
+
+
+def _where(predicate: str, dialect: str):
+    if dialect == "sqlite":
+        # SQLite stores booleans as 0/1
+        predicate = predicate.replace("false", "0").replace("true", "1")
+    return sa.text(predicate)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    if "vouchers" in tables:
+        columns = {column["name"] for column in inspector.get_columns("vouchers")}
+        if "is_reserved" not in columns:
+            op.add_column("vouchers", sa.Column("is_reserved", sa.Boolean(), nullable=True,
+                                                server_default=sa.false()))
+        if "reserved_until" not in columns:
+            op.add_column("vouchers", sa.Column("reserved_until", sa.DateTime(), nullable=True))
+
+    dialect = bind.dialect.name
+    pending = []
+    for name, table, columns, predicate in INDEXES:
+        if table not in tables:
+            continue
+        if name in {index["name"] for index in inspector.get_indexes(table)}:
+            continue
+        pending.append((name, table, columns, predicate))
+    if not pending:
+        return
+
+    # CONCURRENTLY keeps vouchers writable while PostgreSQL builds the index;
+    # it cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, predicate in pending:
+            options = {}
+            if predicate is not None:
+                options[f"{dialect}_where"] = _where(predicate, dialect)
+            if dialect == "postgresql":
+                options["postgresql_concurrently"] = True
+            op.create_index(name, table, columns, **options)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    postgresql = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            if table in tables and name in {index["name"] for index in inspector.get_indexes(table)}:
+                op.drop_index(name, table_name=table, postgresql_concurrently=postgresql)
@@ -0,0 +1,41 @@
+"""refresh tokens table
+
+Outstanding refresh tokens by jti, so refresh rotation and logout hold across
+restarts and worker processes. Refresh tokens issued before this table existed
+are rejected and those users log in again.
+
+Revision ID: a3e6c1b8d702
+Revises: f1c7a2d94b58
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e6c1b8d702'
+down_revision: Union[str, None] = 'f1c7a2d94b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "refresh_tokens" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "refresh_tokens",
+        sa.Column("jti", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_refresh_tokens_user_id", "refresh_tokens", ["user_id"])
+    op.create_index("ix_refresh_tokens_expires_at", "refresh_tokens", ["expires_at"])
+
+
+def downgrade() -> None:
+    if "refresh_tokens" in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_table("refresh_tokens")
@@ -0,0 +1,49 @@
+"""upload jobs table
+
+Creates ``upload_jobs``, which tracks queued voucher PDF uploads and their
+progress.
+
+Revision ID: b2d9e4a7c160
+Revises: e5b9d3fa0c47
+Create Date: 2026-10-17 17:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d9e4a7c160'
+down_revision: Union[str, None] = 'e5b9d3fa0c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "upload_jobs" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "upload_jobs",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("filename", sa.String(), nullable=True),
+        sa.Column("voucher_type", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("pages_total", sa.Integer(), nullable=True),
+        sa.Column("pages_parsed", sa.Integer(), nullable=False),
+        sa.Column("codes_found", sa.Integer(), nullable=False),
+        sa.Column("codes_inserted", sa.Integer(), nullable=False),
+        sa.Column("duplicates", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("result", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    if "upload_jobs" in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_table("upload_jobs")
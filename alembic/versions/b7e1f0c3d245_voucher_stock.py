@@ -0,0 +1,37 @@
+"""voucher stock counters
+
+Creates the per-denomination ``voucher_stock`` table. The application fills
+it from the vouchers table on its first start.
+
+Revision ID: b7e1f0c3d245
+Revises: 9c2d4e6f8a01
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e1f0c3d245'
+down_revision: Union[str, None] = '9c2d4e6f8a01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "voucher_stock" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "voucher_stock",
+        sa.Column("amount", sa.Float(), primary_key=True),
+        sa.Column("free", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("held", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sold", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("voucher_stock")
@@ -0,0 +1,50 @@
+"""webhook events inbox
+
+Creates ``webhook_events``, the inbox the Paystack webhook endpoint writes to
+and the webhook workers drain. The unique (event, reference) constraint is what
+makes a redelivered webhook a no-op.
+
+Revision ID: c8f2b6d41e93
+Revises: a3e6c1b8d702
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f2b6d41e93'
+down_revision: Union[str, None] = 'a3e6c1b8d702'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "webhook_events" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "webhook_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event", sa.String(), nullable=False),
+        sa.Column("reference", sa.String(), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("received_at", sa.DateTime(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+        sa.Column("latency_ms", sa.Float(), nullable=True),
+        sa.UniqueConstraint("event", "reference", name="uq_webhook_events_event_reference"),
+    )
+    op.create_index("ix_webhook_events_id", "webhook_events", ["id"])
+    op.create_index("ix_webhook_events_status", "webhook_events", ["status"])
+    op.create_index("ix_webhook_events_next_attempt_at", "webhook_events", ["next_attempt_at"])
+
+
+def downgrade() -> None:
+    if "webhook_events" in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_table("webhook_events")
@@ -0,0 +1,46 @@
+"""voucher history
+
+Creates ``voucher_history``, where the archiver moves sold vouchers.
+
+Revision ID: d4a8c2e91f36
+Revises: b7e1f0c3d245
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8c2e91f36'
+down_revision: Union[str, None] = 'b7e1f0c3d245'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "voucher_history" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "voucher_history",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("code", sa.String(), nullable=False),
+        sa.Column("amount", sa.Float()),
+        sa.Column("value", sa.Integer()),
+        sa.Column("validity_days", sa.Integer()),
+        sa.Column("is_used", sa.Boolean()),
+        sa.Column("is_reserved", sa.Boolean()),
+        sa.Column("reserved_until", sa.DateTime(), nullable=True),
+        sa.Column("purchased_date", sa.DateTime(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("reference", sa.String(), nullable=True),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_voucher_history_user_id", "voucher_history", ["user_id"])
+    op.create_index("ix_voucher_history_reference", "voucher_history", ["reference"])
+
+
+def downgrade() -> None:
+    op.drop_table("voucher_history")
@@ -0,0 +1,46 @@
+"""archive jobs table
+
+Creates ``archive_jobs``, which records requested and scheduled archivals and
+their progress so every worker process can report them.
+
+Revision ID: d9a3f5e2b871
+Revises: c8f2b6d41e93
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9a3f5e2b871'
+down_revision: Union[str, None] = 'c8f2b6d41e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "archive_jobs" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "archive_jobs",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("older_than", sa.DateTime(), nullable=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("archived", sa.Integer(), nullable=False),
+        sa.Column("batches", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_archive_jobs_status", "archive_jobs", ["status"])
+
+
+def downgrade() -> None:
+    if "archive_jobs" in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_table("archive_jobs")
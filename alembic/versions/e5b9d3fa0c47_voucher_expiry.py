@@ -0,0 +1,40 @@
+"""voucher expiry flag
+
+Adds ``is_expired``, set by the scheduler's expiry job, to vouchers and
+voucher_history.
+
+Revision ID: e5b9d3fa0c47
+Revises: d4a8c2e91f36
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b9d3fa0c47'
+down_revision: Union[str, None] = 'd4a8c2e91f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("vouchers", "voucher_history")
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for table in TABLES:
+        if table in tables and "is_expired" not in {c["name"] for c in inspector.get_columns(table)}:
+            op.add_column(table, sa.Column("is_expired", sa.Boolean(), nullable=True, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for table in TABLES:
+        if table in tables and "is_expired" in {c["name"] for c in inspector.get_columns(table)}:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.drop_column("is_expired")
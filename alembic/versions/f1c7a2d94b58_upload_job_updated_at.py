@@ -0,0 +1,36 @@
+"""upload job heartbeat
+
+Adds ``updated_at`` to upload_jobs. It is bumped by every progress write and
+used at startup to fail jobs whose worker died.
+
+Revision ID: f1c7a2d94b58
+Revises: b2d9e4a7c160
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c7a2d94b58'
+down_revision: Union[str, None] = 'b2d9e4a7c160'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "upload_jobs" in inspector.get_table_names() and \
+            "updated_at" not in {c["name"] for c in inspector.get_columns("upload_jobs")}:
+        op.add_column("upload_jobs", sa.Column("updated_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "upload_jobs" in inspector.get_table_names() and \
+            "updated_at" in {c["name"] for c in inspector.get_columns("upload_jobs")}:
+        with op.batch_alter_table("upload_jobs") as batch_op:
+            batch_op.drop_column("updated_at")
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from schemas.auth import Token
-from controller.auth import authenticate_user
-from models.database import get_db
+from schemas.auth import RefreshRequest, Token
+from controller.auth import authenticate_user, logout, oauth2_scheme, refresh_tokens
+from utils.request_threads import ThreadTaggingRoute
 
-auth_router = APIRouter(prefix="/auth", tags=["Auth"])
+auth_router = APIRouter(prefix="/auth", tags=["Auth"], route_class=ThreadTaggingRoute)
 
 @auth_router.post("/token", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    return authenticate_user(form_data.username, form_data.password, db)
\ No newline at end of file
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    return await authenticate_user(form_data.username, form_data.password)
+
+@auth_router.post("/refresh", response_model=Token)
+async def refresh(request: RefreshRequest):
+    return await refresh_tokens(request.refresh_token)
+
+@auth_router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_user(request: RefreshRequest, token: str = Depends(oauth2_scheme)):
+    await logout(request.refresh_token, token)
@@ -0,0 +1,41 @@
+from typing import Optional
+
+import fastapi
+from fastapi import Depends
+
+from controller.auth import get_current_user
+from controller.health import HealthController
+from controller.profiling import ProfilingController
+from models.user import User
+from utils.request_threads import ThreadTaggingRoute
+
+health_router = fastapi.APIRouter(prefix="/health", route_class=ThreadTaggingRoute)
+
+
+@health_router.get("/db-pool")
+def get_db_pool_status(user: User = Depends(get_current_user)):
+    """Connection pool usage for this worker process, plus replica pools and lag when configured."""
+    return HealthController.get_pool_status(user)
+
+
+@health_router.get("/metrics")
+def get_metrics(user: User = Depends(get_current_user)):
+    """In-process counters and latency histograms (Paystack calls, ...)."""
+    return HealthController.get_metrics(user)
+
+
+@health_router.get("/scheduler")
+def get_scheduler_status(user: User = Depends(get_current_user)):
+    """Scheduled maintenance jobs and whether this worker is running them."""
+    return HealthController.get_scheduler_status(user)
+
+
+@health_router.get("/profiles")
+def get_request_profiles(route: Optional[str] = None, user: User = Depends(get_current_user)):
+    """Hottest functions of recently profiled requests (PROFILING_ENABLED), per route."""
+    return ProfilingController.get_profiles(user, route)
+
+
+@health_router.delete("/profiles", status_code=204)
+def clear_request_profiles(user: User = Depends(get_current_user)):
+    ProfilingController.clear_profiles(user)
@@ -1,19 +1,26 @@
-from typing import List
-from fastapi import Depends, Request, UploadFile, File
+from typing import List, Literal, Optional
+from fastapi import Depends, Request, UploadFile, File, Query
 from loguru import logger
 import fastapi
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from requests import Session
 from controller.voucher_crud import VoucherCRUDController
 from controller.voucher_payment import VoucherPaymentController
 from controller.voucher_upload import VoucherUploadController
+from controller.voucher_stock import VoucherStockController
+from controller.voucher_archive import VoucherArchiveController
+from controller.payment_reconciliation import PaymentReconciliationController, payment_reconciliation
+from controller.upload_jobs import UploadJobController
+from controller.webhook_inbox import WebhookInboxController
 from models.user import User
 from controller.auth import get_current_user
 from models import get_db, Voucher
 from schemas.payment import WebhookResponse
+from utils.request_threads import ThreadTaggingRoute
 from schemas.voucher import VoucherPurchase, VoucherOut, VoucherPurchaseResponse, VoucherUpdate, VoucherIn, \
-    DeleteUsedVouchersResponse, UploadVouchersResponse
+    VoucherInventory, UploadJobOut, VoucherFilter, ArchiveJobOut, ReconciliationReport
 
-voucher_router = fastapi.APIRouter(prefix="/voucher")
+voucher_router = fastapi.APIRouter(prefix="/voucher", route_class=ThreadTaggingRoute)
 
 
 voucher_crud_controller = VoucherCRUDController()
@@ -32,15 +39,19 @@ def initiate_voucher_purchase(
                 f"")
     return result
 
-@voucher_router.post("/upload-vouchers", response_model=UploadVouchersResponse)
+@voucher_router.post("/upload-vouchers", response_model=UploadJobOut, status_code=202)
 async def upload_vouchers_endpoint(
     file: UploadFile,
     voucher_type: str,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Endpoint to upload and process voucher PDF files."""
-    return voucher_upload_controller.upload_vouchers(db, file, voucher_type, current_user)
+    """Queue a voucher PDF for processing; poll /upload-jobs/{job_id} for progress."""
+    return await UploadJobController.submit(file, voucher_type, current_user)
+
+@voucher_router.get("/upload-jobs/{job_id}", response_model=UploadJobOut)
+async def get_upload_job(job_id: str, current_user: User = Depends(get_current_user)):
+    logger.info(f"Router: Getting upload job {job_id}")
+    return await UploadJobController.get_job(job_id, current_user)
 
 @voucher_router.post("/complete/{reference}", response_model=VoucherOut)
 def complete_purchase(
@@ -54,61 +65,143 @@ def complete_purchase(
     return result
 
 @voucher_router.post("/webhook", response_model=WebhookResponse)
-async def handle_paystack_webhook(request: Request, db: Session = Depends(get_db)):
-    logger.info("Webhook triggered")
+async def handle_paystack_webhook(request: Request):
     """Handle Paystack webhook events"""
+    logger.info("Webhook triggered")
     payload = await request.body()
     signature = request.headers.get("x-paystack-signature")
-    response = await voucher_payment_controller.handle_webhook(db, payload, signature)
+    response = await voucher_payment_controller.handle_webhook(payload, signature)
     return response
 
+
+@voucher_router.get("/webhook-events")
+async def get_webhook_events(status: Optional[str] = None, limit: int = Query(100, ge=1, le=1000),
+                             user: User = Depends(get_current_user)):
+    logger.info("Router: Getting webhook inbox events")
+    return await WebhookInboxController.get_events(user, status, limit)
+
 @voucher_router.get("/active_voucher/{voucher_reference}", response_model=VoucherOut)
-async def get_voucher_by_reference(voucher_reference: str,user: User = Depends(get_current_user)):
+def get_voucher_by_reference(voucher_reference: str,user: User = Depends(get_current_user)):
     logger.info(f"Router: Getting Voucher with ID: {voucher_reference}")
 
     return voucher_payment_controller.get_voucher_by_reference(voucher_reference)
 
 
-@voucher_router.delete("/used", response_model=DeleteUsedVouchersResponse)
-def delete_used_vouchers(
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Delete all vouchers where is_used is True"""
+@voucher_router.delete("/used", response_model=ArchiveJobOut, status_code=202)
+async def delete_used_vouchers(user: User = Depends(get_current_user)):
+    """Queue moving all vouchers where is_used is True to the voucher history;
+    poll /archive-jobs/{job_id} for progress."""
+    return await VoucherArchiveController.submit(user)
+
+
+@voucher_router.get("/archive-progress", response_model=ArchiveJobOut)
+async def get_archive_progress(user: User = Depends(get_current_user)):
+    """The most recent archival, requested or scheduled."""
+    return await VoucherArchiveController.get_job(user)
+
+
+@voucher_router.get("/archive-jobs/{job_id}", response_model=ArchiveJobOut)
+async def get_archive_job(job_id: str, user: User = Depends(get_current_user)):
+    return await VoucherArchiveController.get_job(user, job_id)
+
+
+@voucher_router.post("/reconcile", response_model=ReconciliationReport)
+def reconcile_payments(user: User = Depends(get_current_user)):
+    return payment_reconciliation.run(user)
 
-    return voucher_crud_controller.delete_used_vouchers(db, user)
+
+@voucher_router.get("/reconcile-report", response_model=ReconciliationReport)
+def get_reconciliation_report(user: User = Depends(get_current_user)):
+    return PaymentReconciliationController.get_last_report(user)
+
+
+def page_response(page: dict) -> ORJSONResponse:
+    """Serialize a page of plain row dicts once, skipping response_model validation."""
+    headers = {}
+    if page["next_cursor"] is not None:
+        headers["X-Next-Cursor"] = str(page["next_cursor"])
+    if page["total"] is not None:
+        headers["X-Total-Count"] = str(page["total"])
+    return ORJSONResponse(page["items"], headers=headers)
 
 
 @voucher_router.get("", response_model=List[VoucherOut])
-async def get_vouchers(user: User = Depends(get_current_user)):
+async def get_vouchers(
+    filters: VoucherFilter = Depends(),
+    after_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    include_total: bool = False,
+    user: User = Depends(get_current_user)
+):
+    """Page through vouchers by id; pass X-Next-Cursor back as after_id.
+    X-Total-Count is a planner estimate when no filter is given."""
     logger.info("Router: Getting all vouchers")
-    vouchers=  voucher_crud_controller.get_vouchers(user)
-    return vouchers
+    page = await voucher_crud_controller.get_vouchers(user, filters, after_id, limit, include_total)
+    return page_response(page)
 
 @voucher_router.get("/all_vouchers", response_model=List[VoucherOut])
-async def get_vouchers_by_user_id(user: User = Depends(get_current_user)):
+async def get_vouchers_by_user_id(
+    filters: VoucherFilter = Depends(),
+    after_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    include_total: bool = False,
+    user: User = Depends(get_current_user)
+):
     logger.info(f"Router: Getting all vouchers bought by user with id : {user.id}")
-    vouchers=  voucher_crud_controller.get_vouchers_by_user_id(user)
-    return vouchers
+    page = await voucher_crud_controller.get_vouchers_by_user_id(user, filters, after_id, limit, include_total)
+    return page_response(page)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+@voucher_router.get("/export")
+async def export_vouchers(
+    filters: VoucherFilter = Depends(),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    user: User = Depends(get_current_user)
+):
+    """Stream every matching voucher as NDJSON or CSV."""
+    logger.info("Router: Exporting vouchers")
+    rows = voucher_crud_controller.export_vouchers(user, filters, format)
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="vouchers.{format}"'},
+    )
+
+
+@voucher_router.get("/inventory", response_model=List[VoucherInventory])
+async def get_voucher_inventory(user: User = Depends(get_current_user)):
+    logger.info("Router: Getting voucher inventory")
+    return await voucher_crud_controller.get_inventory(user)
+
+
+@voucher_router.get("/stock", response_model=List[VoucherInventory])
+async def get_voucher_stock(user: User = Depends(get_current_user)):
+    logger.info("Router: Getting voucher stock")
+    return await VoucherStockController.get_stock(user)
 
 
 @voucher_router.get("/{voucher_id}", response_model=VoucherOut)
 async def get_voucher(voucher_id: int ,user: User = Depends(get_current_user)):
     logger.info(f"Router: Getting Voucher with ID: {voucher_id}")
 
-    return voucher_crud_controller.get_voucher_by_id(voucher_id)
+    return await voucher_crud_controller.get_voucher_by_id(voucher_id)
 
 
 @voucher_router.post("", response_model=VoucherOut)
 async def create_voucher(voucher: VoucherIn, user: User = Depends(get_current_user)):
-    return voucher_crud_controller.create_voucher(voucher,user)
+    return await voucher_crud_controller.create_voucher(voucher,user)
 
 
 @voucher_router.put("/{voucher_id}", response_model=VoucherOut)
 async def update_voucher(voucher_id: int, voucher: VoucherUpdate, user: User = Depends(get_current_user)):
-    return voucher_crud_controller.update_voucher(voucher_id, voucher,user)
+    return await voucher_crud_controller.update_voucher(voucher_id, voucher,user)
 
 
 @voucher_router.delete("/{voucher_id}")
 async def delete_voucher(voucher_id: int, user: User = Depends(get_current_user)):
-    return voucher_crud_controller.delete_voucher(voucher_id,user)
\ No newline at end of file
+    return await voucher_crud_controller.delete_voucher(voucher_id,user)
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
@@ -10,7 +11,104 @@ class AppSettings(BaseSettings):
     API_VERSION: str = "1.0.0"
     API_DESCRIPTION: str = "Voucher Purchase System"
     API_PREFIX: str = "/api/v1"
+    # Prometheus scrape endpoint (per worker process), outside API_PREFIX; with
+    # METRICS_TOKEN set, scrapes must send "Authorization: Bearer <token>"
+    METRICS_ENABLED: bool = True
+    METRICS_PATH: str = "/metrics"
+    METRICS_TOKEN: Optional[str] = None
+    # SQL statements per request: X-DB-Query-Count / X-DB-Query-Time-Ms response
+    # headers when enabled, and a warning for any statement slower than
+    # SLOW_QUERY_SECONDS (0 disables)
+    QUERY_STATS_HEADERS: bool = False
+    SLOW_QUERY_SECONDS: float = 0.5
+    # Request profiling: samples PROFILE_SAMPLE_RATE of requests, plus any request
+    # with an "X-Profile: 1" header and an admin access token; keeps the top
+    # PROFILE_TOP_N functions of the last PROFILE_RING_SIZE profiles per route
+    PROFILING_ENABLED: bool = False
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_SECONDS: float = 0.005
+    PROFILE_TOP_N: int = 20
+    PROFILE_RING_SIZE: int = 20
     DATABASE_URL: str = DATABASE_URL
+    # Derived from DATABASE_URL (asyncpg driver) when not set
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # Connection pool (per worker process)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Optional read replica for read-only endpoints (async URL derived like
+    # ASYNC_DATABASE_URL). Reads go to the primary while the replica lags more than
+    # REPLICA_MAX_LAG_SECONDS, and for READ_AFTER_WRITE_SECONDS after a user writes
+    READ_REPLICA_URL: Optional[str] = None
+    ASYNC_READ_REPLICA_URL: Optional[str] = None
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_SECONDS: float = 1.0
+    READ_AFTER_WRITE_SECONDS: float = 10.0
+    READ_AFTER_WRITE_CACHE_SIZE: int = 100000
+
+    # How long a voucher stays held for a customer while they pay
+    VOUCHER_RESERVATION_TTL_SECONDS: int = 900
+
+    # Paystack HTTP client
+    PAYSTACK_TIMEOUT_SECONDS: float = 10.0
+    PAYSTACK_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    PAYSTACK_MAX_RETRIES: int = 2
+    PAYSTACK_RETRY_BACKOFF_SECONDS: float = 0.25
+    PAYSTACK_POOL_SIZE: int = 20
+
+    # Webhook inbox workers (per worker process)
+    WEBHOOK_WORKERS: int = 2
+    WEBHOOK_POLL_INTERVAL_SECONDS: float = 5.0
+    WEBHOOK_MAX_ATTEMPTS: int = 5
+    WEBHOOK_RETRY_DELAY_SECONDS: int = 30
+    WEBHOOK_LEASE_SECONDS: int = 300
+
+    # PDF voucher extraction (0 workers = one per CPU)
+    PDF_EXTRACT_WORKERS: int = 0
+    PDF_PAGES_PER_TASK: int = 8
+    PDF_PARALLEL_MIN_PAGES: int = 16
+
+    # Voucher upload jobs running at once (per worker process); queued or
+    # running jobs without progress for UPLOAD_JOB_STALE_SECONDS are failed
+    # at startup as interrupted
+    UPLOAD_JOB_CONCURRENCY: int = 2
+    UPLOAD_JOB_STALE_SECONDS: int = 600
+
+    # Set AUTH_INVALIDATION_REDIS_URL to broadcast access token revocations (per
+    # token and per user) across worker processes; PRINCIPAL_CACHE_REDIS_URL is
+    # still read as a fallback
+    AUTH_INVALIDATION_REDIS_URL: Optional[str] = os.getenv("PRINCIPAL_CACHE_REDIS_URL")
+
+    # JWT lifetimes; access tokens carry the principal so they are kept short
+    ACCESS_TOKEN_EXPIRE_SECONDS: int = 900
+    REFRESH_TOKEN_EXPIRE_SECONDS: int = 604800
+
+    # Payment reconciliation: Paystack verify calls in flight / per second, vouchers
+    # settled per transaction and held references checked per run
+    RECONCILE_CONCURRENCY: int = 4
+    RECONCILE_RATE_PER_SECOND: float = 10.0
+    RECONCILE_BATCH_SIZE: int = 100
+    RECONCILE_MAX_REFERENCES: int = 1000
+
+    # Archival of sold vouchers into voucher_history: rows per transaction and
+    # the pause between batches that lets allocation traffic through. One
+    # archival runs at a time (on PostgreSQL across processes, via the advisory
+    # lock ARCHIVE_LOCK_KEY); jobs without progress for ARCHIVE_JOB_STALE_SECONDS
+    # are treated as interrupted
+    ARCHIVE_BATCH_SIZE: int = 1000
+    ARCHIVE_BATCH_PAUSE_SECONDS: float = 0.05
+    ARCHIVE_LOCK_KEY: int = 7206102
+    ARCHIVE_JOB_STALE_SECONDS: int = 600
+
+    # Password hashing pool (0 workers = one per CPU); requests beyond
+    # workers + PASSWORD_HASH_MAX_PENDING get a 503 instead of queueing forever
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_MAX_PENDING: int = 64
 
     class config:
         env_file = ".env"
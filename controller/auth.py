@@ -1,63 +1,226 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime
 from typing import Optional
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from loguru import logger
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from models import User
-from passlib.context import CryptContext
+from sqlalchemy import delete, select, update
+from models import RefreshToken, User
 from jose import jwt, JWTError
 from dotenv import load_dotenv
 import os
-from utils.session import SessionManager as DBSession
+from config.setting import app_settings
+from utils.cache import RedisInvalidationChannel, RevocationList
+from utils.passwords import PasswordHasherBusy, dummy_verify, verify_password
+from utils.session import AsyncSessionManager as AsyncDBSession, current_user_id
 
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
+# User changes, broadcast so every worker rejects that user's older access tokens
+user_token_revocations = RedisInvalidationChannel(
+    None, app_settings.AUTH_INVALIDATION_REDIS_URL, "user-token-revoke",
+    on_invalidate=lambda user_id: token_revocations.revoke_subject(user_id))
+
+# Logged-out access token ids, and users whose older access tokens carry stale
+# claims. Access tokens are short-lived, so this stays in memory; refresh
+# tokens are tracked in the refresh_tokens table.
+token_revocations = RevocationList()
+token_id_revocations = RedisInvalidationChannel(
+    None, app_settings.AUTH_INVALIDATION_REDIS_URL, "token-revoke",
+    on_invalidate=lambda key: token_revocations.revoke_token(*_parse_revoked_token(key)))
+
+# Access token claim -> principal field
+ACCESS_CLAIMS = {"usr": "username", "eml": "email", "nam": "full_name", "adm": "is_admin", "act": "is_active"}
+
 class TokenData(BaseModel):
     user_id: Optional[int] = None
 
-def authenticate_user(username: str, password: str, db: Session):
-    logger.info(f"Authenticating user with email: {username}")
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not pwd_context.verify(password, user.hashed_password):
-        logger.warning(f"Authentication failed for email: {username}")
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-    access_token = jwt.encode({"sub": str(user.id)}, SECRET_KEY, algorithm=ALGORITHM)  # Use user.id
-    logger.info(f"Access token generated for user: {user.username}")
-    return {"access_token": access_token,"user_id": user.id, "token_type": "bearer", "is_admin": user.is_admin }
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def _parse_revoked_token(key: str):
+    jti, _, expires_at = key.rpartition(":")
+    return jti, float(expires_at)
+
+
+def revoke_user_tokens(user_id: int) -> None:
+    """Reject the user's access tokens issued before now, in every worker.
+
+    They carry the old claims, so the client has to refresh.
+    """
+    user_token_revocations.publish(user_id)
+
+
+def revoke_token(payload: dict) -> None:
+    token_id_revocations.publish(f"{payload['jti']}:{payload['exp']}")
+
+
+async def listen_for_token_revocations() -> None:
+    await asyncio.gather(
+        user_token_revocations.listen(parse_key=int),
+        token_id_revocations.listen(),
+    )
+
+
+def create_tokens(user: User) -> tuple:
+    """An access/refresh token response for ``user``, and the refresh token row to store."""
+    # Sub-second iat: a token issued in the same second as a user change is still cut off
+    now = time.time()
+    access_claims = {claim: getattr(user, field) for claim, field in ACCESS_CLAIMS.items()}
+    access_token = jwt.encode({
+        "sub": str(user.id), "typ": "access", "jti": uuid.uuid4().hex, "iat": now,
+        "exp": int(now) + app_settings.ACCESS_TOKEN_EXPIRE_SECONDS, **access_claims,
+    }, SECRET_KEY, algorithm=ALGORITHM)
+    refresh_jti = uuid.uuid4().hex
+    refresh_expires_at = int(now) + app_settings.REFRESH_TOKEN_EXPIRE_SECONDS
+    refresh_token = jwt.encode({
+        "sub": str(user.id), "typ": "refresh", "jti": refresh_jti, "iat": now, "exp": refresh_expires_at,
+    }, SECRET_KEY, algorithm=ALGORITHM)
+    tokens = {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "expires_in": app_settings.ACCESS_TOKEN_EXPIRE_SECONDS,
+        "user_id": user.id,
+        "token_type": "bearer",
+        "is_admin": user.is_admin,
+    }
+    return tokens, RefreshToken(jti=refresh_jti, user_id=user.id,
+                                expires_at=datetime.fromtimestamp(refresh_expires_at))
+
+
+async def issue_tokens(db, user: User) -> dict:
+    """Create a token pair and store its refresh token, committing ``db``'s transaction."""
+    tokens, refresh_row = create_tokens(user)
+    # The user's expired refresh tokens are cleared as new ones are issued
+    await db.execute(delete(RefreshToken).where(
+        RefreshToken.user_id == user.id, RefreshToken.expires_at < datetime.now()))
+    db.add(refresh_row)
+    await db.commit()
+    return tokens
+
+
+def decode_token(token: str, token_type: str) -> dict:
+    """Decode and check a token of ``token_type`` ("access" or "refresh")."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    logger.info(f"Validating token: {token[:10]}...")
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id_str: str = payload.get("sub")
-        if user_id_str is None:
-            logger.warning("Token missing 'sub' claim")
-            raise credentials_exception
-        user_id = int(user_id_str)
-        token_data = TokenData(user_id=user_id)
-        logger.debug(f"Token decoded, user_id: {user_id}")
-    except ValueError:
-        logger.error(f"Invalid user_id in token: {user_id_str}")
+        user_id = int(payload["sub"])
+    except (KeyError, TypeError, ValueError):
+        logger.warning("Token missing or invalid 'sub' claim")
         raise credentials_exception
     except JWTError as e:
         logger.error(f"JWT validation failed: {str(e)}")
         raise credentials_exception
+    if payload.get("typ") != token_type:
+        logger.warning(f"Unexpected token type {payload.get('typ')} for user {user_id}")
+        raise credentials_exception
+    # Refresh tokens are checked against refresh_tokens when they are used
+    if token_type == "access" and token_revocations.is_revoked(payload.get("jti"), user_id, payload.get("iat", 0)):
+        logger.warning(f"Revoked access token for user {user_id}")
+        raise credentials_exception
+    payload["sub"] = user_id
+    return payload
 
-    with DBSession() as db:
-        user = db.query(User).filter(User.id == token_data.user_id).first()
+def is_admin_bearer(authorization: Optional[str]) -> bool:
+    """Whether an Authorization header carries a valid admin access token."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        payload = decode_token(token, "access")
+    except HTTPException:
+        return False
+    return bool(payload.get("adm") and payload.get("act"))
+
+async def authenticate_user(username: str, password: str):
+    logger.info(f"Authenticating user with email: {username}")
+    async with AsyncDBSession() as db:
+        user = (await db.execute(select(User).where(User.username == username).limit(1))).scalar_one_or_none()
+    # Verify with the connection back in the pool: bcrypt takes a few hundred ms
+    try:
+        if user is None:
+            await dummy_verify()
+            verified, new_hash = False, None
+        else:
+            verified, new_hash = await verify_password(password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Server busy, retry shortly", headers={"Retry-After": "1"})
+    if not verified:
+        logger.warning(f"Authentication failed for email: {username}")
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash predates the current work factor
+        logger.info(f"Rehashing password for user: {user.username}")
+        async with AsyncDBSession() as db:
+            await db.execute(update(User).where(User.id == user.id).values(hashed_password=new_hash))
+            await db.commit()
+    async with AsyncDBSession() as db:
+        tokens = await issue_tokens(db, user)
+    logger.info(f"Access token generated for user: {user.username}")
+    return tokens
+
+
+async def refresh_tokens(refresh_token: str):
+    """Rotate a refresh token: the old one is consumed and a fresh pair is issued.
+
+    Deleting the stored token and storing its successor commit together, so a
+    token that was logged out, already rotated or is being refreshed
+    concurrently finds no row and is rejected.
+    """
+    payload = decode_token(refresh_token, "refresh")
+    async with AsyncDBSession() as db:
+        consumed = (await db.execute(delete(RefreshToken).where(
+            RefreshToken.jti == payload.get("jti"), RefreshToken.user_id == payload["sub"],
+        ))).rowcount
+        user = await db.get(User, payload["sub"]) if consumed else None
         if user is None or not user.is_active:
-            logger.warning(f"User not found or inactive: {token_data.user_id}")
-            raise credentials_exception
-        logger.info(f"User authenticated: {user.username}")
-        return user
\ No newline at end of file
+            logger.warning(f"Refresh rejected for user: {payload['sub']}")
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        tokens = await issue_tokens(db, user)
+        logger.info(f"Tokens refreshed for user: {user.username}")
+        return tokens
+
+
+async def logout(refresh_token: str, access_token: str) -> None:
+    payload = decode_token(refresh_token, "refresh")
+    async with AsyncDBSession() as db:
+        await db.execute(delete(RefreshToken).where(
+            RefreshToken.jti == payload.get("jti"), RefreshToken.user_id == payload["sub"]))
+        await db.commit()
+    try:
+        revoke_token(decode_token(access_token, "access"))
+    except HTTPException:
+        # Already expired or revoked: nothing left to revoke
+        pass
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    logger.info(f"Validating token: {token[:10]}...")
+    payload = decode_token(token, "access")
+    token_data = TokenData(user_id=payload["sub"])
+    logger.debug(f"Token decoded, user_id: {token_data.user_id}")
+
+    principal = {field: payload[claim] for claim, field in ACCESS_CLAIMS.items()}
+    principal["id"] = token_data.user_id
+
+    if not principal["is_active"]:
+        logger.warning(f"User inactive: {token_data.user_id}")
+        raise credentials_exception
+    logger.info(f"User authenticated: {principal['username']}")
+    current_user_id.set(principal["id"])
+    # Detached, never added to a session: callers only read its attributes
+    return User(**principal)
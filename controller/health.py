@@ -0,0 +1,32 @@
+from fastapi import HTTPException, status
+from loguru import logger
+
+from core import setup as db_setup
+from cron.scheduler import scheduler
+from models.user import User
+from utils.metrics import registry
+
+
+class HealthController:
+    """Operational state of this worker process; admins only, like the request profiles."""
+
+    @staticmethod
+    def _require_admin(user: User, what: str) -> None:
+        if not user.is_admin:
+            logger.warning(f"Unauthorized attempt to read {what} by {user.username}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    @staticmethod
+    def get_pool_status(user: User) -> dict:
+        HealthController._require_admin(user, "database pool status")
+        return db_setup.get_pool_statuses()
+
+    @staticmethod
+    def get_metrics(user: User) -> dict:
+        HealthController._require_admin(user, "metrics")
+        return registry.snapshot()
+
+    @staticmethod
+    def get_scheduler_status(user: User) -> dict:
+        HealthController._require_admin(user, "scheduler status")
+        return scheduler.status()
@@ -0,0 +1,175 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, status
+from loguru import logger
+from sqlalchemy import select, update
+
+from config.setting import app_settings
+from models.user import User
+from models.voucher import Voucher
+from utils.metrics import Counter
+from utils.paystack import PaystackClient, PaystackError, paystack_client
+from utils.ratelimit import RateLimiter
+from utils.request_threads import follow
+from utils.session import SessionManager as DBSession
+from utils.sql import count_by_amount, stock_adjustment
+
+reconciled_payments_total = Counter(
+    "reconciled_payments_total", "Held payments checked by reconciliation", ["outcome"])
+
+# Paystack transaction statuses that can never turn into a successful charge
+FAILED_STATUSES = {"failed", "reversed"}
+OUTCOMES = ("finalized", "released", "pending", "skipped", "errors")
+
+_reconcile_lock = threading.Lock()
+last_report: Optional[dict] = None
+
+
+class ReconciliationInProgress(Exception):
+    """Another reconciliation is already running in this process."""
+
+
+class PaymentReconciliationController:
+    """Settles held vouchers whose Paystack outcome never reached us.
+
+    Every held voucher with a payment reference is verified with Paystack
+    (at most RECONCILE_CONCURRENCY calls in flight, RECONCILE_RATE_PER_SECOND
+    per second). Paid ones are marked sold, failed ones go back to free stock,
+    and anything still in progress is left to the webhook or the reservation
+    sweeper. Outcomes are written RECONCILE_BATCH_SIZE at a time, one
+    transaction per batch.
+    """
+
+    def __init__(self, paystack: PaystackClient = paystack_client) -> None:
+        self.paystack = paystack
+        self.limiter = RateLimiter(app_settings.RECONCILE_RATE_PER_SECOND,
+                                   burst=app_settings.RECONCILE_CONCURRENCY)
+
+    @staticmethod
+    def pending_references(limit: int) -> list:
+        """Held vouchers awaiting payment, those whose hold expires first first."""
+        with DBSession() as db:
+            return db.execute(
+                select(Voucher.reference, Voucher.amount)
+                .where(Voucher.is_used == False, Voucher.is_reserved == True, Voucher.reference.isnot(None))
+                .order_by(Voucher.reserved_until)
+                .limit(limit)
+            ).all()
+
+    def _verify(self, reference: str) -> tuple:
+        self.limiter.acquire()
+        try:
+            data = self.paystack.verify_transaction(reference)["data"]
+        except PaystackError as e:
+            logger.warning(f"Controller: Reconciliation could not verify {reference}: {str(e)}")
+            return reference, "error", None
+        return reference, data.get("status"), data.get("amount")
+
+    @staticmethod
+    def _apply(batch: list, report: dict) -> None:
+        """Write one batch of (reference, action, paid_amount) in a single transaction."""
+        now = datetime.now()
+        moves = {"finalized": [], "released": []}
+        with DBSession() as db:
+            for reference, action, paid_amount in batch:
+                held = [Voucher.reference == reference, Voucher.is_used == False, Voucher.is_reserved == True]
+                if action == "finalized":
+                    # The paid amount must match the held denomination
+                    statement = (
+                        update(Voucher)
+                        .where(*held, Voucher.amount == paid_amount)
+                        .values(is_used=True, is_reserved=False, reserved_until=None, purchased_date=now)
+                    )
+                else:
+                    statement = (
+                        update(Voucher)
+                        .where(*held)
+                        .values(is_reserved=False, reserved_until=None, user_id=None, reference=None)
+                    )
+                amount = db.execute(
+                    statement.returning(Voucher.amount).execution_options(synchronize_session=False)
+                ).scalar()
+                if amount is None:
+                    # Settled meanwhile by the webhook, the user or the sweeper, or amount mismatch
+                    report["skipped"] += 1
+                    continue
+                report[action] += 1
+                report["references"][action].append(reference)
+                moves[action].append(amount)
+            for amount, count in count_by_amount(moves["finalized"]).items():
+                db.execute(stock_adjustment(db, amount, held=-count, sold=count))
+            for amount, count in count_by_amount(moves["released"]).items():
+                db.execute(stock_adjustment(db, amount, held=-count, free=count))
+            db.commit()
+
+    def reconcile(self, limit: Optional[int] = None) -> dict:
+        """Verify up to ``limit`` held references and settle them; returns the summary report."""
+        global last_report
+        if not _reconcile_lock.acquire(blocking=False):
+            raise ReconciliationInProgress()
+        try:
+            started_at = datetime.now()
+            pending = self.pending_references(limit or app_settings.RECONCILE_MAX_REFERENCES)
+            report = {outcome: 0 for outcome in OUTCOMES}
+            report.update(checked=len(pending), started_at=started_at,
+                          references={"finalized": [], "released": [], "errors": []})
+            logger.info(f"Controller: Reconciliation checking {len(pending)} held payments")
+
+            batch = []
+            with ThreadPoolExecutor(max_workers=app_settings.RECONCILE_CONCURRENCY,
+                                    thread_name_prefix="reconcile") as executor:
+                verify = follow(self._verify)
+                futures = [executor.submit(verify, row.reference) for row in pending]
+                for future in as_completed(futures):
+                    reference, payment_status, paid = future.result()
+                    if payment_status == "success":
+                        batch.append((reference, "finalized", paid / 100 if paid is not None else None))
+                    elif payment_status in FAILED_STATUSES:
+                        batch.append((reference, "released", None))
+                    elif payment_status == "error":
+                        report["errors"] += 1
+                        report["references"]["errors"].append(reference)
+                    else:
+                        report["pending"] += 1
+                    if len(batch) >= app_settings.RECONCILE_BATCH_SIZE:
+                        self._apply(batch, report)
+                        batch = []
+            if batch:
+                self._apply(batch, report)
+
+            for outcome in OUTCOMES:
+                reconciled_payments_total.inc(report[outcome], outcome=outcome)
+            report["finished_at"] = datetime.now()
+            report["duration_seconds"] = (report["finished_at"] - started_at).total_seconds()
+            logger.info(f"Controller: Reconciliation checked {report['checked']}: {report['finalized']} finalized, "
+                        f"{report['released']} released, {report['pending']} pending, "
+                        f"{report['skipped']} skipped, {report['errors']} errors "
+                        f"in {report['duration_seconds']:.1f}s")
+            last_report = report
+            return report
+        finally:
+            _reconcile_lock.release()
+
+    def run(self, user: User) -> dict:
+        if not user.is_admin:
+            logger.warning(f"Unauthorized attempt to reconcile payments by {user.username}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+        try:
+            return self.reconcile()
+        except ReconciliationInProgress:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Reconciliation already running")
+
+    @staticmethod
+    def get_last_report(user: User) -> dict:
+        if not user.is_admin:
+            logger.warning(f"Unauthorized attempt to read reconciliation report by {user.username}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+        if last_report is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No reconciliation has run yet")
+        return last_report
+
+
+payment_reconciliation = PaymentReconciliationController()
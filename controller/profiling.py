@@ -0,0 +1,26 @@
+from typing import Optional
+
+from fastapi import HTTPException, status
+from loguru import logger
+
+from models.user import User
+from utils.profiling import profile_store
+
+
+class ProfilingController:
+
+    @staticmethod
+    def get_profiles(user: User, route: Optional[str] = None) -> dict:
+        """Stored request profiles keyed by "METHOD /route/template", optionally one route only."""
+        if not user.is_admin:
+            logger.warning(f"Unauthorized attempt to read request profiles by {user.username}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+        return profile_store.get(route)
+
+    @staticmethod
+    def clear_profiles(user: User) -> None:
+        if not user.is_admin:
+            logger.warning(f"Unauthorized attempt to clear request profiles by {user.username}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+        profile_store.clear()
+        logger.info(f"Controller: Request profiles cleared by {user.username}")
@@ -0,0 +1,171 @@
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Optional
+
+from fastapi import HTTPException, status, UploadFile
+from loguru import logger
+from sqlalchemy import func, select, update
+
+from config.setting import app_settings
+from controller.voucher_upload import VoucherUploadController
+from models.upload_job import UploadJob
+from models.user import User
+from utils.pdf import count_pages
+from utils.session import SessionManager as DBSession, AsyncSessionManager as AsyncDBSession
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=app_settings.UPLOAD_JOB_CONCURRENCY, thread_name_prefix="upload-job")
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+class UploadJobController:
+
+    @staticmethod
+    async def submit(file: UploadFile, voucher_type: str, user: User) -> dict:
+        """Validate and queue an upload; at most UPLOAD_JOB_CONCURRENCY jobs run at once."""
+        amount, validity_days, value = VoucherUploadController.validate_upload(file.filename, voucher_type, user)
+        try:
+            contents = await file.read()
+        finally:
+            await file.close()
+
+        job = UploadJob(
+            id=uuid.uuid4().hex,
+            status=JOB_QUEUED,
+            filename=file.filename,
+            voucher_type=voucher_type,
+            user_id=user.id,
+        )
+        async with AsyncDBSession() as db:
+            db.add(job)
+            await db.commit()
+            job_data = job.to_dict()
+
+        future = _get_executor().submit(
+            UploadJobController.run, job.id, contents, amount, validity_days, value, user.id)
+        future.add_done_callback(partial(UploadJobController._job_done, job.id))
+        logger.info(f"Upload job {job.id} queued for {file.filename} by {user.username}")
+        return job_data
+
+    @staticmethod
+    def run(job_id: str, contents: bytes, amount: int, validity_days: int, value: int, user_id: int) -> None:
+        with DBSession() as db:
+            # Only a job still queued is started: a long wait may have had it failed as interrupted
+            claimed = db.execute(
+                update(UploadJob)
+                .where(UploadJob.id == job_id, UploadJob.status == JOB_QUEUED)
+                .values(status=JOB_RUNNING, started_at=datetime.now(), updated_at=datetime.now())
+            ).rowcount
+            db.commit()
+            if not claimed:
+                logger.warning(f"Upload job {job_id} is no longer queued; not running it")
+                return
+            job = db.get(UploadJob, job_id)
+            last_flush = time.monotonic()
+
+            def progress(**fields):
+                nonlocal last_flush
+                for key, field_value in fields.items():
+                    setattr(job, key, field_value)
+                if time.monotonic() - last_flush >= PROGRESS_INTERVAL_SECONDS:
+                    db.commit()  # process_upload commits per chunk too; this covers parse-only stretches
+                    last_flush = time.monotonic()
+
+            try:
+                job.pages_total = count_pages(contents)
+                db.commit()
+                result = VoucherUploadController.process_upload(
+                    db, contents, amount, validity_days, value, user_id, progress=progress,
+                    page_count=job.pages_total)
+                job.status = JOB_COMPLETED
+                job.result = result.model_dump_json()
+                logger.info(f"Upload job {job_id} completed: {result.message}")
+            except HTTPException as e:
+                # process_upload rolled back: codes_inserted is what its committed chunks recorded
+                job.status = JOB_FAILED
+                job.error = f"{e.detail} ({job.codes_inserted} vouchers inserted before the failure)"
+                logger.error(f"Upload job {job_id} failed: {job.error}")
+            except Exception as e:
+                db.rollback()
+                job = db.get(UploadJob, job_id)
+                job.status = JOB_FAILED
+                job.error = f"{str(e)} ({job.codes_inserted} vouchers inserted before the failure)"
+                logger.error(f"Upload job {job_id} failed: {job.error}")
+            job.finished_at = datetime.now()
+            db.commit()
+
+    @staticmethod
+    def _job_done(job_id: str, future: Future) -> None:
+        """Record a job that raised outside run()'s own error handling instead of losing it."""
+        if future.cancelled() or future.exception() is None:
+            return
+        error = future.exception()
+        logger.opt(exception=error).error(f"Upload job {job_id} crashed: {str(error)}")
+        try:
+            with DBSession() as db:
+                db.execute(
+                    update(UploadJob)
+                    .where(UploadJob.id == job_id, UploadJob.status.in_((JOB_QUEUED, JOB_RUNNING)))
+                    .values(status=JOB_FAILED, error=str(error), finished_at=datetime.now())
+                )
+                db.commit()
+        except Exception as e:
+            logger.error(f"Upload job {job_id} could not be marked failed: {str(e)}")
+
+    @staticmethod
+    def fail_interrupted_jobs() -> int:
+        """Fail queued or running jobs that made no progress for UPLOAD_JOB_STALE_SECONDS.
+
+        Jobs live in a worker's memory, so a restart or deploy leaves their rows
+        unfinished. Jobs still moving on other workers keep bumping updated_at
+        and are left alone. Returns how many were failed.
+        """
+        cutoff = datetime.now() - timedelta(seconds=app_settings.UPLOAD_JOB_STALE_SECONDS)
+        with DBSession() as db:
+            jobs = db.execute(
+                select(UploadJob)
+                .where(UploadJob.status.in_((JOB_QUEUED, JOB_RUNNING)),
+                       func.coalesce(UploadJob.updated_at, UploadJob.created_at) < cutoff)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            for job in jobs:
+                job.status = JOB_FAILED
+                job.error = f"Interrupted by a restart ({job.codes_inserted} vouchers inserted before it stopped)"
+                job.finished_at = datetime.now()
+                logger.warning(f"Upload job {job.id} was interrupted after inserting {job.codes_inserted} vouchers")
+            db.commit()
+        return len(jobs)
+
+    @staticmethod
+    async def get_job(job_id: str, user: User) -> dict:
+        if not user.is_admin:
+            logger.warning(f"Unauthorized attempt to read upload job {job_id} by {user.username}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+        async with AsyncDBSession() as db:
+            job = await db.get(UploadJob, job_id)
+            if not job:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload job not found")
+            return job.to_dict()
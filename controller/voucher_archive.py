@@ -0,0 +1,243 @@
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Optional
+
+from fastapi import HTTPException, status
+from loguru import logger
+from sqlalchemy import func, or_, select, update
+
+from config.setting import app_settings
+from cron.scheduler import LeaderLock
+from models.archive_job import ArchiveJob
+from models.user import User
+from models.voucher import Voucher
+from utils.metrics import Counter
+from utils.session import SessionManager as DBSession, AsyncSessionManager as AsyncDBSession
+from utils.sql import archive_used_vouchers_batch
+
+vouchers_archived_total = Counter("vouchers_archived_total", "Sold vouchers moved to voucher_history")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# One archival at a time: the thread lock within this process, the advisory
+# lock (PostgreSQL only) across processes
+_archive_lock = threading.Lock()
+_archive_advisory_lock = LeaderLock(app_settings.DATABASE_URL, app_settings.ARCHIVE_LOCK_KEY, name="archive lock")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive-job")
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _active_job_query():
+    """The newest queued or running job that is still making progress."""
+    cutoff = datetime.now() - timedelta(seconds=app_settings.ARCHIVE_JOB_STALE_SECONDS)
+    return (
+        select(ArchiveJob)
+        .where(ArchiveJob.status.in_((JOB_QUEUED, JOB_RUNNING)),
+               func.coalesce(ArchiveJob.updated_at, ArchiveJob.created_at) >= cutoff)
+        .order_by(ArchiveJob.created_at.desc())
+        .limit(1)
+    )
+
+
+class ArchiveInProgress(Exception):
+    """Another archival is already queued or running."""
+
+
+class VoucherArchiveController:
+
+    @staticmethod
+    async def submit(user: User) -> dict:
+        """Queue an archival of every sold voucher; poll /archive-jobs/{job_id} for progress."""
+        logger.info(f"User {user.username} requested archival of used vouchers")
+        if not user.is_admin:
+            logger.warning(f"Unauthorized attempt to archive used vouchers by {user.username}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+        async with AsyncDBSession() as db:
+            if (await db.execute(_active_job_query())).scalar_one_or_none() is not None:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Archival already running")
+            job = ArchiveJob(id=uuid.uuid4().hex, status=JOB_QUEUED, user_id=user.id)
+            db.add(job)
+            await db.commit()
+            job_data = job.to_dict()
+
+        future = _get_executor().submit(VoucherArchiveController.run, job.id)
+        future.add_done_callback(partial(VoucherArchiveController._job_done, job.id))
+        logger.info(f"Archive job {job.id} queued by {user.username}")
+        return job_data
+
+    @staticmethod
+    def archive_used_vouchers(older_than: Optional[datetime] = None) -> int:
+        """Archive sold vouchers (purchased before ``older_than``, if given) in the calling thread.
+
+        Recorded as a job like requested archivals. Raises ArchiveInProgress when
+        another one is queued or running. Returns the number archived.
+        """
+        with DBSession() as db:
+            if db.execute(_active_job_query()).scalar_one_or_none() is not None:
+                raise ArchiveInProgress()
+            job = ArchiveJob(id=uuid.uuid4().hex, status=JOB_QUEUED, older_than=older_than)
+            db.add(job)
+            db.commit()
+            job_id = job.id
+        return VoucherArchiveController.run(job_id)
+
+    @staticmethod
+    def run(job_id: str) -> int:
+        """Move the job's vouchers to voucher_history and return how many moved.
+
+        Works in ARCHIVE_BATCH_SIZE batches, each its own short transaction, and
+        records progress on the job row after every batch.
+        """
+        if not _archive_lock.acquire(blocking=False):
+            VoucherArchiveController._fail(job_id, "Another archival is running")
+            raise ArchiveInProgress()
+        try:
+            if not _archive_advisory_lock.acquire():
+                VoucherArchiveController._fail(job_id, "Another archival is running")
+                raise ArchiveInProgress()
+            try:
+                return VoucherArchiveController._archive(job_id)
+            finally:
+                _archive_advisory_lock.release()
+        finally:
+            _archive_lock.release()
+
+    @staticmethod
+    def _archive(job_id: str) -> int:
+        with DBSession() as db:
+            claimed = db.execute(
+                update(ArchiveJob)
+                .where(ArchiveJob.id == job_id, ArchiveJob.status == JOB_QUEUED)
+                .values(status=JOB_RUNNING, started_at=datetime.now(), updated_at=datetime.now())
+            ).rowcount
+            db.commit()
+            if not claimed:
+                logger.warning(f"Archive job {job_id} is no longer queued; not running it")
+                return 0
+            older_than = db.get(ArchiveJob, job_id).older_than
+
+        criteria = []
+        if older_than is not None:
+            criteria.append(or_(Voucher.purchased_date < older_than, Voucher.purchased_date.is_(None)))
+        logger.info(f"Controller: Archiving used vouchers purchased before {older_than or 'now'}")
+        total = batches = 0
+        try:
+            while True:
+                with DBSession() as db:
+                    archived = archive_used_vouchers_batch(db, criteria, app_settings.ARCHIVE_BATCH_SIZE)
+                    if archived:
+                        total += archived
+                        batches += 1
+                        db.execute(
+                            update(ArchiveJob)
+                            .where(ArchiveJob.id == job_id)
+                            .values(archived=total, batches=batches, updated_at=datetime.now())
+                        )
+                        db.commit()
+                if not archived:
+                    break
+                vouchers_archived_total.inc(archived)
+                logger.info(f"Controller: Archived batch {batches}: {total} vouchers so far")
+                if archived < app_settings.ARCHIVE_BATCH_SIZE:
+                    break
+                time.sleep(app_settings.ARCHIVE_BATCH_PAUSE_SECONDS)
+        except Exception as e:
+            logger.error(f"Controller: Error archiving used vouchers: {str(e)}")
+            VoucherArchiveController._fail(job_id, f"{str(e)} ({total} vouchers archived before the failure)")
+            raise
+
+        with DBSession() as db:
+            db.execute(
+                update(ArchiveJob)
+                .where(ArchiveJob.id == job_id)
+                .values(status=JOB_COMPLETED, finished_at=datetime.now())
+            )
+            db.commit()
+        logger.info(f"Controller: Archived {total} used vouchers")
+        return total
+
+    @staticmethod
+    def _fail(job_id: str, error: str) -> None:
+        with DBSession() as db:
+            db.execute(
+                update(ArchiveJob)
+                .where(ArchiveJob.id == job_id, ArchiveJob.status.in_((JOB_QUEUED, JOB_RUNNING)))
+                .values(status=JOB_FAILED, error=error, finished_at=datetime.now())
+            )
+            db.commit()
+
+    @staticmethod
+    def _job_done(job_id: str, future: Future) -> None:
+        """Record a job that raised outside run()'s own error handling instead of losing it."""
+        if future.cancelled() or future.exception() is None:
+            return
+        error = future.exception()
+        if isinstance(error, ArchiveInProgress):
+            return
+        logger.opt(exception=error).error(f"Archive job {job_id} crashed: {str(error)}")
+        try:
+            VoucherArchiveController._fail(job_id, str(error))
+        except Exception as e:
+            logger.error(f"Archive job {job_id} could not be marked failed: {str(e)}")
+
+    @staticmethod
+    def fail_interrupted_jobs() -> int:
+        """Fail queued or running jobs that made no progress for ARCHIVE_JOB_STALE_SECONDS.
+
+        Like upload jobs, they run in a worker's memory, so a restart leaves
+        their rows unfinished. Returns how many were failed.
+        """
+        cutoff = datetime.now() - timedelta(seconds=app_settings.ARCHIVE_JOB_STALE_SECONDS)
+        with DBSession() as db:
+            jobs = db.execute(
+                select(ArchiveJob)
+                .where(ArchiveJob.status.in_((JOB_QUEUED, JOB_RUNNING)),
+                       func.coalesce(ArchiveJob.updated_at, ArchiveJob.created_at) < cutoff)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            for job in jobs:
+                job.status = JOB_FAILED
+                job.error = f"Interrupted by a restart ({job.archived} vouchers archived before it stopped)"
+                job.finished_at = datetime.now()
+                logger.warning(f"Archive job {job.id} was interrupted after archiving {job.archived} vouchers")
+            db.commit()
+        return len(jobs)
+
+    @staticmethod
+    async def get_job(user: User, job_id: Optional[str] = None) -> dict:
+        """The job ``job_id``, or the most recent one."""
+        if not user.is_admin:
+            logger.warning(f"Unauthorized attempt to read archive progress by {user.username}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+        async with AsyncDBSession() as db:
+            if job_id is not None:
+                job = await db.get(ArchiveJob, job_id)
+            else:
+                job = (await db.execute(
+                    select(ArchiveJob).order_by(ArchiveJob.created_at.desc()).limit(1)
+                )).scalar_one_or_none()
+            if not job:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Archive job not found")
+            return job.to_dict()
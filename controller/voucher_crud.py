@@ -1,55 +1,153 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
 from fastapi import HTTPException, status
 from fastapi.encoders import jsonable_encoder
 from loguru import logger
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
 
 from models.user import User
 from models.voucher import Voucher
-from schemas.voucher import VoucherIn, VoucherUpdate
-from utils.session import SessionManager as DBSession
+from schemas.voucher import VoucherIn, VoucherUpdate, VoucherFilter
+from utils.session import AsyncSessionManager as AsyncDBSession
+from utils.sql import (
+    POSTGRESQL_ESTIMATED_COUNT,
+    VOUCHER_COLUMNS,
+    stock_adjustment,
+    stock_bucket,
+    voucher_export_query,
+    inventory_query,
+    voucher_count_query,
+    voucher_filter_criteria,
+    voucher_page_query,
+)
 
 
 class VoucherCRUDController:
 
     @staticmethod
-    def get_vouchers( user: User):
+    async def _list_vouchers(db, criteria: list, after_id: Optional[int], limit: int,
+                             include_total: bool) -> dict:
+        rows = (await db.execute(voucher_page_query(criteria, after_id, limit))).all()
+        next_cursor = rows[limit - 1].id if len(rows) > limit else None
+        vouchers_list = [row._asdict() for row in rows[:limit]]
+
+        total = None
+        if include_total:
+            if not criteria and db.get_bind().dialect.name == "postgresql":
+                total = (await db.execute(POSTGRESQL_ESTIMATED_COUNT)).scalar()
+            if total is None or total < 0:
+                total = (await db.execute(voucher_count_query(criteria))).scalar()
+        return {"items": vouchers_list, "next_cursor": next_cursor, "total": total}
+
+    @staticmethod
+    async def get_vouchers(user: User, filters: VoucherFilter, after_id: Optional[int] = None,
+                           limit: int = 100, include_total: bool = False):
         logger.info(f"User {user.username} requested to get all vouchers")
         if not user.is_admin:  # Restrict to admins
-            logger.warning(f"Unauthorized attempt to delete used vouchers by {user.username}")
+            logger.warning(f"Unauthorized attempt to get all vouchers by {user.username}")
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
         try:
-            with DBSession() as db:
-                logger.info("Controller: Fetching all vouchers")
-                vouchers = db.query(Voucher).all()
-                vouchers_list = [voucher.to_dict() for voucher in vouchers]
-                logger.info(f"Controller: Fetched Vouchers ==-> {vouchers_list}")
-                return vouchers_list
+            async with AsyncDBSession(read_only=True) as db:
+                logger.info(f"Controller: Fetching vouchers after ID {after_id}, filters {filters}")
+                page = await VoucherCRUDController._list_vouchers(
+                    db, voucher_filter_criteria(filters), after_id, limit, include_total)
+                logger.info(f"Controller: Fetched {len(page['items'])} vouchers")
+                return page
         except Exception as e:
             logger.error(f"Controller: Error fetching vouchers: {str(e)}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching vouchers")
 
     @staticmethod
-    def get_vouchers_by_user_id(user: User):
+    async def get_vouchers_by_user_id(user: User, filters: VoucherFilter, after_id: Optional[int] = None,
+                                      limit: int = 100, include_total: bool = False):
         logger.info(f"User {user.username} requested to get vouchers used by user with ID {user.id}")
-        user_id = user.id
+        filters = filters.model_copy(update={"user_id": user.id})
+        # A voucher held for an unpaid checkout carries the buyer's id; only reveal paid ones
+        criteria = voucher_filter_criteria(filters) + [~((Voucher.is_reserved == True) & (Voucher.is_used == False))]
         try:
-            with DBSession() as db:
-                logger.info("Controller: Fetching all vouchers by user ID")
-                vouchers = db.query(Voucher).filter(Voucher.user_id == user_id).all()
-                vouchers_list = [voucher.to_dict() for voucher in vouchers]
-                logger.info(f"Controller: Fetched Vouchers ==-> {vouchers_list}")
-                return vouchers_list
+            async with AsyncDBSession(read_only=True) as db:
+                logger.info(f"Controller: Fetching vouchers by user ID after ID {after_id}, filters {filters}")
+                page = await VoucherCRUDController._list_vouchers(db, criteria, after_id, limit, include_total)
+                logger.info(f"Controller: Fetched {len(page['items'])} vouchers")
+                return page
         except Exception as e:
             logger.error(f"Controller: Error fetching vouchers: {str(e)}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching vouchers")
 
     @staticmethod
-    def get_voucher_by_id(voucher_id: int):
+    def _export_default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+    @staticmethod
+    def export_vouchers(user: User, filters: VoucherFilter, export_format: str) -> AsyncIterator[str]:
+        """Stream matching vouchers as NDJSON or CSV, one chunk per cursor batch."""
+        logger.info(f"User {user.username} requested voucher export as {export_format}")
+        if not user.is_admin:  # Restrict to admins
+            logger.warning(f"Unauthorized attempt to export vouchers by {user.username}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+        columns = [column.key for column in VOUCHER_COLUMNS]
+        criteria = voucher_filter_criteria(filters)
+
+        async def generate():
+            exported = 0
+            async with AsyncDBSession(read_only=True) as db:
+                result = await db.stream(voucher_export_query(criteria))
+                if export_format == "csv":
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    writer.writerow(columns)
+                    yield buffer.getvalue()
+                async for rows in result.partitions():
+                    if export_format == "csv":
+                        buffer = io.StringIO()
+                        writer = csv.writer(buffer)
+                        writer.writerows(
+                            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+                            for row in rows
+                        )
+                        yield buffer.getvalue()
+                    else:
+                        yield "".join(
+                            json.dumps(row._asdict(), default=VoucherCRUDController._export_default) + "\n"
+                            for row in rows
+                        )
+                    exported += len(rows)
+            logger.info(f"Controller: Exported {exported} vouchers as {export_format}")
+
+        return generate()
+
+    @staticmethod
+    async def get_inventory(user: User):
+        logger.info(f"User {user.username} requested voucher inventory")
+        if not user.is_admin:  # Restrict to admins
+            logger.warning(f"Unauthorized attempt to get voucher inventory by {user.username}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
         try:
-            with DBSession() as db:
+            async with AsyncDBSession(read_only=True) as db:
+                rows = (await db.execute(inventory_query())).all()
+                inventory = [
+                    {"amount": row.amount, "free": row.free or 0, "held": row.held or 0, "sold": row.sold or 0}
+                    for row in rows
+                ]
+                logger.info(f"Controller: Fetched Inventory ==-> {inventory}")
+                return inventory
+        except Exception as e:
+            logger.error(f"Controller: Error fetching voucher inventory: {str(e)}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching inventory")
+
+    @staticmethod
+    async def get_voucher_by_id(voucher_id: int):
+        try:
+            async with AsyncDBSession(read_only=True) as db:
                 logger.info(f"Controller: Fetching voucher with ID {voucher_id}")
-                voucher = db.query(Voucher).filter(Voucher.id == voucher_id).first()
+                voucher = await db.get(Voucher, voucher_id)
                 if not voucher:
                     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Voucher not found")
                 logger.info(f"Controller: Fetched Voucher ==-> {jsonable_encoder(voucher)}")
@@ -61,35 +159,37 @@ class VoucherCRUDController:
             logger.error(f"Controller: Error fetching voucher with ID {voucher_id}: {str(e)}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching voucher")
 
-
     @staticmethod
-    def create_voucher(voucher: VoucherIn, user: User):
+    async def create_voucher(voucher: VoucherIn, user: User):
         logger.info(f"User {user.username} requested to create voucher")
         if not user.is_admin:  # Restrict to admins
-            logger.warning(f"Unauthorized attempt to delete used vouchers by {user.username}")
+            logger.warning(f"Unauthorized attempt to create voucher by {user.username}")
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
         try:
-            with DBSession() as db:
+            async with AsyncDBSession() as db:
                 # Check if the voucher code already exists
-                existing_voucher = db.query(Voucher).filter(Voucher.code == voucher.code).first()
+                existing_voucher = (await db.execute(
+                    select(Voucher.id).where(Voucher.code == voucher.code).limit(1)
+                )).first()
                 if existing_voucher:
                     raise HTTPException(status_code=400, detail="Voucher code already exists!")
 
-                # Convert Pydantic model to dictionary
-                voucher_data = voucher.model_dump()
-
-                # Create and save the voucher instance
-                voucher_instance = Voucher(**voucher_data)
+                voucher_instance = Voucher(**voucher.model_dump())
                 logger.info(f"Controller: Creating voucher: {voucher_instance.to_dict()}")
 
                 db.add(voucher_instance)
-                db.commit()
-                db.refresh(voucher_instance)
+                await db.execute(stock_adjustment(
+                    db, voucher_instance.amount,
+                    **{stock_bucket(voucher_instance.is_used, voucher_instance.is_reserved): 1}))
+                await db.commit()
+                await db.refresh(voucher_instance)
 
                 logger.info(f"Controller: Voucher created with code {voucher_instance.code}")
 
                 return voucher_instance.to_dict()
 
+        except HTTPException as e:
+            raise e
         except SQLAlchemyError as e:
             logger.error(f"Controller: SQLAlchemy Error while creating voucher: {str(e)}")
             raise HTTPException(
@@ -105,25 +205,32 @@ class VoucherCRUDController:
             )
 
     @staticmethod
-    def update_voucher(voucher_id: int, update_data: VoucherUpdate, user: User):
+    async def update_voucher(voucher_id: int, update_data: VoucherUpdate, user: User):
         logger.info(f"User {user.username} requested to update voucher with ID {voucher_id}")
         if not user.is_admin:  # Restrict to admins
-            logger.warning(f"Unauthorized attempt to delete used vouchers by {user.username}")
+            logger.warning(f"Unauthorized attempt to update voucher by {user.username}")
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
         try:
-            with DBSession() as db:
+            async with AsyncDBSession() as db:
                 logger.info(f"Controller: Updating voucher with ID {voucher_id}")
-                voucher = db.query(Voucher).filter(Voucher.id == voucher_id).first()
+                voucher = await db.get(Voucher, voucher_id, with_for_update=True)
                 if not voucher:
-                    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Voucher not found")
+                    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Voucher not found")
 
+                before = (voucher.amount, stock_bucket(voucher.is_used, voucher.is_reserved))
                 for key, value in update_data.model_dump(exclude_unset=True).items():
                     setattr(voucher, key, value)
-                db.commit()
-                db.refresh(voucher)
+                after = (voucher.amount, stock_bucket(voucher.is_used, voucher.is_reserved))
+                if before != after:
+                    await db.execute(stock_adjustment(db, before[0], **{before[1]: -1}))
+                    await db.execute(stock_adjustment(db, after[0], **{after[1]: 1}))
+                await db.commit()
+                await db.refresh(voucher)
                 logger.info(f"Controller: Voucher with ID {voucher_id} updated")
                 return voucher.to_dict()
 
+        except HTTPException as e:
+            raise e
         except SQLAlchemyError as e:
             logger.error(f"Controller: SQLAlchemy Error while updating voucher with ID {voucher_id}: {str(e)}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {str(e)}")
@@ -133,15 +240,14 @@ class VoucherCRUDController:
                                 detail=f"Error updating voucher: {str(e)}")
 
     @staticmethod
-    def delete_voucher(voucher_id: int, user: User):
-
-        logger.info(f"User {user.username} requested deletion of used vouchers")
+    async def delete_voucher(voucher_id: int, user: User):
+        logger.info(f"User {user.username} requested deletion of voucher with ID {voucher_id}")
         if not user.is_admin:  # Restrict to admins
-            logger.warning(f"Unauthorized attempt to delete used vouchers by {user.username}")
+            logger.warning(f"Unauthorized attempt to delete voucher by {user.username}")
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
-        with DBSession() as db:
+        async with AsyncDBSession() as db:
             logger.info(f"Controller: Deleting voucher with ID {voucher_id}")
-            voucher = db.query(Voucher).filter(Voucher.id == voucher_id).first()
+            voucher = await db.get(Voucher, voucher_id, with_for_update=True)
 
             if not voucher:
                 logger.error(f"Controller: Voucher with ID {voucher_id} not found")
@@ -151,40 +257,23 @@ class VoucherCRUDController:
                 )
 
             try:
-                db.delete(voucher)
-                db.commit()
+                await db.delete(voucher)
+                await db.execute(stock_adjustment(
+                    db, voucher.amount, **{stock_bucket(voucher.is_used, voucher.is_reserved): -1}))
+                await db.commit()
                 logger.info(f"Controller: Voucher with ID {voucher_id} deleted")
                 return {"message": f"Voucher with ID {voucher_id} deleted successfully"}
             except SQLAlchemyError as e:
-                db.rollback()  # Rollback transaction in case of error
+                await db.rollback()  # Rollback transaction in case of error
                 logger.error(f"Controller: SQLAlchemy Error while deleting voucher with ID {voucher_id}: {str(e)}")
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail=f"Database error:{str(e)}"
                 )
             except Exception as e:
-                db.rollback()
+                await db.rollback()
                 logger.error(f"Controller: Unexpected error deleting voucher with ID {voucher_id}: {str(e)}")
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Error deleting voucher"
                 )
-
-    @staticmethod
-    def delete_used_vouchers( db: Session, user: User) -> dict:
-        """Delete all vouchers where is_used is True"""
-        logger.info(f"User {user.username} requested deletion of used vouchers")
-        if not user.is_admin:  # Restrict to admins
-            logger.warning(f"Unauthorized attempt to delete used vouchers by {user.username}")
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
-
-        # Delete used vouchers in one query
-        deleted_count = db.query(Voucher).filter(Voucher.is_used == True).delete(synchronize_session=False)
-        db.commit()
-
-        if deleted_count == 0:
-            logger.info("No used vouchers found to delete")
-            return {"message": "No used vouchers found", "deleted_count": 0}
-
-        logger.info(f"Deleted {deleted_count} used vouchers by {user.username}")
-        return {"message": f"Deleted {deleted_count} used vouchers", "deleted_count": deleted_count}
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import hashlib
 import hmac
 import json
@@ -7,23 +7,28 @@ import os
 from fastapi.encoders import jsonable_encoder
 
 from utils.session import SessionManager as DBSession
-import requests
 from dotenv import load_dotenv
 from fastapi import HTTPException, status, BackgroundTasks
 from loguru import logger
 from passlib.context import CryptContext
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from config.setting import app_settings
+from controller.voucher_stock import VoucherStockController
+from controller.webhook_inbox import WebhookInboxController
 from models.user import User
 from models.voucher import Voucher
+from models.voucher_history import VoucherHistory
 from schemas.payment import WebhookResponse
 from schemas.voucher import VoucherPurchase, VoucherOut
+from utils.paystack import PaystackError, paystack_client
+from utils.sql import allocate_voucher, stock_adjustment
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 load_dotenv()
-PAYSTACK_URL = os.getenv("PAYSTACK_URL")
-
 PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY")
 
 
@@ -38,44 +43,51 @@ class VoucherPaymentController:
     def __init__(self):
         self.PAYSTACK_SECRET_KEY = PAYSTACK_SECRET_KEY
         self.VALID_AMOUNTS = [2, 5, 10, 20, 50]
-        self.headers = {
-            "Authorization": f"Bearer {self.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json"
-        }
+        self.paystack = paystack_client
 
     def initialize_payment(self,db: Session, amount: float, user: User) -> dict:
         logger.info(f"Initializing payment for amount: {amount}, email: {user.email}")
-        data = {
-            "amount": int(amount * 100),  # Convert to cedis
-            "email": user.email,
-            "currency": "GHS"
-        }
-        # Query an unused voucher that matches the amount
-        voucher = db.query(Voucher).filter(
-            Voucher.amount == amount,
-            Voucher.is_used == False  # Ensure it's not used
-        ).first()
-
+        # Hold a free voucher that matches the amount until the reservation expires
+        voucher = allocate_voucher(
+            db,
+            criteria=[Voucher.amount == amount, Voucher.is_used == False, Voucher.is_reserved.isnot(True)],
+            values={
+                "user_id": user.id,
+                "is_reserved": True,
+                "reserved_until": datetime.now() + timedelta(seconds=app_settings.VOUCHER_RESERVATION_TTL_SECONDS),
+            },
+            stock_move=("free", "held"),
+        )
 
         if not voucher:
             logger.warning(f"No available voucher found for amount: {amount}")
             raise HTTPException(status_code=404, detail="No available voucher found")
 
-        voucher.user_id = user.id
-        db.commit()
-        db.refresh(voucher)
-
-        response = requests.post(f"{PAYSTACK_URL}/initialize",
-                                 headers=self.headers, json=data)
-        if response.status_code != 200:
-            logger.error(f"Payment initialization failed: {response.text}")
+        try:
+            response_data = self.paystack.initialize_transaction(amount, user.email)
+            payment_url = response_data["data"]["authorization_url"]
+            access_code = response_data["data"]["access_code"]
+            reference = response_data["data"]["reference"]
+            payment_status = response_data.get("status")
+        except PaystackError as e:
+            logger.error(f"Payment initialization failed: {str(e)} {e.body}")
+            self.release_reservation(db, voucher.id)
             raise HTTPException(status_code=400, detail="Payment initialization failed")
 
-        response_data = response.json()
-        payment_url = response_data["data"]["authorization_url"]
-        access_code = response_data["data"]["access_code"]
-        reference = response_data["data"]["reference"]
-        payment_status = response_data["status"]
+        # Tie the hold to this payment so completion finds exactly this voucher. If
+        # Paystack was slow the hold may have been swept and re-reserved by another
+        # buyer meanwhile; their hold must not get our reference.
+        attached = db.execute(
+            update(Voucher)
+            .where(Voucher.id == voucher.id, Voucher.is_used == False,
+                   Voucher.is_reserved == True, Voucher.user_id == user.id)
+            .values(reference=reference)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if not attached:
+            logger.warning(f"Hold on voucher {voucher.id} expired before payment {reference} was initialized")
+            raise HTTPException(status_code=409, detail="Voucher reservation expired, please try again")
 
         logger.info(f"Payment initialized, URL: {payment_url}, Access Code: {access_code}, Status: {payment_status}")
         return {
@@ -86,15 +98,97 @@ class VoucherPaymentController:
             "amount": amount
         }
 
+    @staticmethod
+    def release_reservation(db: Session, voucher_id: int) -> None:
+        """Return a held, unpaid voucher to free stock."""
+        amount = db.execute(
+            update(Voucher)
+            .where(Voucher.id == voucher_id, Voucher.is_used == False, Voucher.is_reserved == True)
+            .values(is_reserved=False, reserved_until=None, user_id=None, reference=None)
+            .returning(Voucher.amount)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if amount is not None:
+            db.execute(stock_adjustment(db, amount, held=-1, free=1))
+        db.commit()
+
+    @staticmethod
+    def finalize_purchase(db: Session, reference: str, amount: float, user: User):
+        """Mark a voucher as sold for a paid ``reference``.
+
+        Idempotent per reference, and safe when the webhook worker, /complete and
+        reconciliation finalize the same reference at once: the voucher held for
+        this payment is locked with a blocking FOR UPDATE, so later callers wait
+        and then find it sold. Free stock is only used once no voucher carries
+        the reference (the hold expired and was swept); if a concurrent caller
+        wins that race, the unique reference index rejects the second voucher
+        and the winner's is returned. A reference whose voucher has since been
+        archived is fulfilled already: the archived voucher is returned instead
+        of allocating another.
+        """
+        voucher = db.execute(
+            select(Voucher).where(Voucher.reference == reference).with_for_update()
+        ).scalar_one_or_none()
+        if voucher is not None and voucher.is_used:
+            db.commit()
+            logger.info(f"Reference {reference} already fulfilled with voucher {voucher.code}")
+            return voucher
+
+        values = {
+            "is_used": True,
+            "is_reserved": False,
+            "reserved_until": None,
+            "user_id": user.id,
+            "reference": reference,
+            "purchased_date": datetime.now(),
+        }
+        if voucher is not None:
+            db.execute(
+                update(Voucher)
+                .where(Voucher.id == voucher.id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            db.execute(stock_adjustment(db, voucher.amount, held=-1, sold=1))
+            db.commit()
+            db.refresh(voucher)
+            return voucher
+        db.commit()
+
+        archived = db.execute(
+            select(VoucherHistory).where(VoucherHistory.reference == reference).limit(1)
+        ).scalar_one_or_none()
+        if archived is not None:
+            logger.info(f"Reference {reference} already fulfilled with archived voucher {archived.code}")
+            return archived
+
+        try:
+            return allocate_voucher(
+                db,
+                criteria=[Voucher.amount == amount, Voucher.is_used == False, Voucher.is_reserved.isnot(True)],
+                values=values,
+                stock_move=("free", "sold"),
+            )
+        except IntegrityError:
+            db.rollback()
+            voucher = db.execute(
+                select(Voucher).where(Voucher.reference == reference, Voucher.is_used == True)
+            ).scalar_one_or_none()
+            logger.info(f"Reference {reference} was fulfilled concurrently")
+            return voucher
+
     def verify_payment(self, reference: str) -> dict:
         logger.info(f"Verifying payment for reference: {reference}")
-        response = requests.get(f"{PAYSTACK_URL}/verify/{reference}",
-                                headers=self.headers)
-        if response.status_code != 200 or response.json()["data"]["status"] != "success":
-            logger.error(f"Payment verification failed: {response.text}")
+        try:
+            response_data = self.paystack.verify_transaction(reference)
+        except PaystackError as e:
+            logger.error(f"Payment verification failed: {str(e)} {e.body}")
+            raise HTTPException(status_code=400, detail="Payment verification failed")
+        if response_data["data"]["status"] != "success":
+            logger.error(f"Payment verification failed: {response_data}")
             raise HTTPException(status_code=400, detail="Payment verification failed")
         logger.info(f"Payment verified successfully for reference: {reference}")
-        return response.json()["data"]
+        return response_data["data"]
 
     def buy_voucher(self, db: Session, purchase: VoucherPurchase, user: User) -> dict:
         logger.info(f"User {user.username} attempting to buy voucher for {purchase.amount}")
@@ -102,7 +196,12 @@ class VoucherPaymentController:
             logger.warning(f"Invalid amount {purchase.amount} attempted by {user.username}")
             raise HTTPException(status_code=400, detail="Invalid voucher amount. Must be 2, 5, 10, 20, or 50")
 
-        payment_data = self.initialize_payment(purchase.amount, user)
+        # Cheap counter read: an empty denomination never touches vouchers or Paystack
+        if not VoucherStockController.in_stock(db, purchase.amount):
+            logger.warning(f"Voucher amount {purchase.amount} out of stock")
+            raise HTTPException(status_code=404, detail="No available voucher found")
+
+        payment_data = self.initialize_payment(db, purchase.amount, user)
         logger.info(f"Voucher purchase initiated for {user.username}, amount: {purchase.amount}")
         return payment_data
 
@@ -114,29 +213,22 @@ class VoucherPaymentController:
         amount = payment_data["amount"] / 100  # Convert to cedis
         user_email = payment_data["customer"]["email"]
         reference = payment_data["reference"]
+        if (user_email or "").lower() != user.email.lower():
+            logger.warning(f"User {user.username} tried to complete reference {reference} paid by {user_email}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Payment belongs to another user")
 
-        # Query an unused voucher that matches the amount
-        voucher = db.query(Voucher).filter(
-            Voucher.user_id == user.id,
-            Voucher.is_used == False ,Voucher.amount == amount # Ensure it's not used
-        ).first()
+        voucher = self.finalize_purchase(db, reference, amount, user)
 
         if not voucher:
             logger.warning(f"No available voucher found for amount: {amount}")
             raise HTTPException(status_code=404, detail="No available voucher found")
 
-        voucher.is_used = True
-        voucher.reference = reference
-        voucher.purchased_date = datetime.now()
-        db.commit()
-        db.refresh(voucher)
-
         logger.info(f"Voucher {voucher.code} assigned to user {user.username}, amount: {amount}")
-        return VoucherOut.from_attributes(voucher)
+        return voucher.to_dict()
 
     @staticmethod
-    async def process_charge_success(db: Session, event: dict):
-        """Handle charge.success event in the background"""
+    def process_charge_success(event: dict) -> bool:
+        """Handle a charge.success event drained from the webhook inbox"""
         logger.info("Processing charge.success event")
         data = event["data"]
         amount = data["amount"] / 100
@@ -145,34 +237,24 @@ class VoucherPaymentController:
         logger.info(
             f"Processing charge.success event details: amount: {amount} reference: {reference} email: {user_email}")
 
-        # Create a new DB session
         with DBSession() as db:
             user = db.query(User).filter(User.email == user_email).first()
             if not user:
                 logger.warning(f"User not found for email: {user_email}")
-                return
+                return False
 
-            vouchers = db.query(Voucher).filter(
-                Voucher.amount == amount
-            )
-            voucher = vouchers.filter(Voucher.is_used == False).first()
+            voucher = VoucherPaymentController.finalize_purchase(db, reference, amount, user)
 
             if not voucher:
                 logger.warning(f"No available voucher found for amount: {amount}")
-                return
-
-            voucher.is_used = True
-            voucher.user_id = user.id
-            voucher.reference = reference
-            voucher.purchased_date = datetime.now()
-            db.commit()
-            db.refresh(voucher)
+                return False
 
             logger.info(f"Voucher {voucher.code} assigned to user {user.username}, amount: {amount}")
+            return True
 
     @staticmethod
-    async def handle_webhook(db: Session, payload: bytes, signature: str) -> WebhookResponse:
-        """Handle Paystack webhook events"""
+    async def handle_webhook(payload: bytes, signature: str) -> WebhookResponse:
+        """Verify a Paystack webhook and store it in the inbox; workers process it"""
         # Verify signature
         logger.info(f"handle Webhook triggered signature: {signature}")
         expected_signature = hmac.new(
@@ -181,22 +263,21 @@ class VoucherPaymentController:
             hashlib.sha512
         ).hexdigest()
 
-        if not hmac.compare_digest(expected_signature, signature):
+        if not hmac.compare_digest(expected_signature, signature or ""):
             logger.warning("Invalid Paystack webhook signature")
             return WebhookResponse(status="success", message="Event received, invalid signature logged")
 
         # Parse event
         try:
             event = json.loads(payload.decode('utf-8'))
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, UnicodeDecodeError):
             logger.error("Failed to parse webhook payload")
             raise HTTPException(status_code=400, detail="Invalid payload")
 
-        logger.info(f"Received Paystack webhook event: {event['event']}")
+        logger.info(f"Received Paystack webhook event: {event.get('event')}")
 
-
-        if event["event"] == "charge.success":
-            await VoucherPaymentController.process_charge_success(db, event)
+        if not await WebhookInboxController.store_event(event, payload):
+            return WebhookResponse(status="success", message="Duplicate event ignored")
 
         return WebhookResponse(status="success", message="Event received")
 
@@ -204,9 +285,17 @@ class VoucherPaymentController:
     def get_voucher_by_reference(voucher_reference: str):
 
         try:
-            with DBSession() as db:
+            with DBSession(read_only=True) as db:
                 logger.info(f"Controller: Fetching voucher with reference: {voucher_reference}")
-                voucher = db.query(Voucher).filter(Voucher.reference == voucher_reference).first()
+                # Held vouchers carry their payment reference too; only reveal paid ones
+                voucher = db.query(Voucher).filter(
+                    Voucher.reference == voucher_reference, Voucher.is_used == True
+                ).first()
+                if not voucher:
+                    # Archived vouchers were sold too: the buyer still gets their code back
+                    voucher = db.query(VoucherHistory).filter(
+                        VoucherHistory.reference == voucher_reference
+                    ).first()
                 if not voucher:
                     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Voucher not found")
                 logger.info(f"Controller: Fetched Voucher ==-> {jsonable_encoder(voucher)}")
@@ -216,4 +305,7 @@ class VoucherPaymentController:
             raise e
         except Exception as e:
             logger.error(f"Controller: Error fetching voucher with reference: {voucher_reference}: {str(e)}")
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching voucher")
\ No newline at end of file
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching voucher")
+
+
+WebhookInboxController.register_handler("charge.success", VoucherPaymentController.process_charge_success)
@@ -0,0 +1,71 @@
+from fastapi import HTTPException, status
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.user import User
+from models.voucher_stock import VoucherStock
+from utils.metrics import Gauge
+from utils.session import SessionManager as DBSession, AsyncSessionManager as AsyncDBSession
+from utils.sql import STOCK_BUCKETS, rebuild_stock
+
+voucher_stock_vouchers = Gauge("voucher_stock_vouchers", "Vouchers per denomination and stock bucket",
+                               ["amount", "bucket"])
+
+
+class VoucherStockController:
+
+    @staticmethod
+    def in_stock(db: Session, amount: float) -> bool:
+        """Whether any free voucher of ``amount`` is left, from the counters alone."""
+        free = db.execute(select(VoucherStock.free).where(VoucherStock.amount == amount)).scalar()
+        return bool(free and free > 0)
+
+    @staticmethod
+    async def get_stock(user: User):
+        logger.info(f"User {user.username} requested voucher stock")
+        try:
+            async with AsyncDBSession(read_only=True) as db:
+                rows = (await db.execute(select(VoucherStock).order_by(VoucherStock.amount))).scalars()
+                return [row.to_dict() for row in rows]
+        except Exception as e:
+            logger.error(f"Controller: Error fetching voucher stock: {str(e)}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching stock")
+
+    @staticmethod
+    def rebuild() -> int:
+        """Recount every denomination from the vouchers table; returns how many had drifted."""
+        with DBSession() as db:
+            stock, previous = rebuild_stock(db)
+        current = {row["amount"]: row for row in stock}
+        drifted = [
+            amount for amount, row in previous.items()
+            if current.get(amount, {"amount": amount, "free": 0, "held": 0, "sold": 0}) != row
+        ]
+        for amount in drifted:
+            logger.warning(f"Controller: Voucher stock for amount {amount} had drifted: "
+                           f"counted {previous[amount]}, actual {current.get(amount)}")
+        logger.info(f"Controller: Rebuilt voucher stock ==-> {stock}")
+        return len(drifted)
+
+    @staticmethod
+    def initialize() -> None:
+        """Seed the counters on first start, when they have never been built."""
+        with DBSession() as db:
+            if db.execute(select(VoucherStock.amount).limit(1)).first() is not None:
+                return
+        VoucherStockController.rebuild()
+
+
+def _stock_levels() -> dict:
+    """Read at scrape time from the counters table, so every worker reports the same totals."""
+    try:
+        with DBSession(read_only=True) as db:
+            rows = db.execute(select(VoucherStock)).scalars().all()
+    except Exception as e:
+        logger.error(f"Controller: Error reading voucher stock for metrics: {str(e)}")
+        return {}
+    return {(f"{row.amount:g}", bucket): getattr(row, bucket) for row in rows for bucket in STOCK_BUCKETS}
+
+
+voucher_stock_vouchers.set_function(_stock_levels)
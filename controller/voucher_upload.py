@@ -2,23 +2,21 @@ import hashlib
 import hmac
 import json
 import os
-import re
-from io import BytesIO
-from typing import List
+from typing import Callable, Optional
 
-import pdfplumber
 import requests
 from dotenv import load_dotenv
-from fastapi import HTTPException, status, UploadFile, BackgroundTasks
+from fastapi import HTTPException, status, BackgroundTasks
 from loguru import logger
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from models.user import User
-from models.voucher import Voucher
 from schemas.payment import WebhookResponse
 from schemas.voucher import UploadVouchersResponse
 from schemas.voucher import VoucherPurchase, VoucherOut
+from utils.pdf import iter_voucher_codes
+from utils.sql import BULK_INSERT_CHUNK_SIZE, bulk_insert_vouchers, stock_adjustment
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -36,27 +34,6 @@ VOUCHER_TYPE_MAPPING = {
 
 
 class VoucherUploadController:
-    @staticmethod
-    def _extract_voucher_codes(pdf_contents: bytes) -> List[str]:
-        """Extract 6-character voucher codes from PDF content."""
-        try:
-            with pdfplumber.open(BytesIO(pdf_contents)) as pdf:
-                all_text = "".join(page.extract_text() or "" for page in pdf.pages)
-                code_pattern = r"\b[a-z0-9]{6}\b"
-                codes = re.findall(code_pattern, all_text, re.MULTILINE)
-                if not codes:
-                    logger.warning("No voucher codes found in PDF")
-                    raise HTTPException(status_code=400, detail="No voucher codes found in PDF")
-                return list(set(codes))  # Remove duplicates
-        except Exception as e:
-            logger.error(f"Error extracting codes from PDF: {str(e)}")
-            raise HTTPException(status_code=400, detail=f"Failed to process PDF: {str(e)}")
-
-
-
-
-
-
     @staticmethod
     def _process_voucher_type(voucher_type: int) -> tuple[int, int, int]:
         """Map voucher_type to amount and validity_days."""
@@ -71,74 +48,99 @@ class VoucherUploadController:
 
 
     @staticmethod
-    def upload_vouchers(
-            db: Session,
-            file: UploadFile,
-            voucher_type: int,
-            user: User
-    ):
-        """Upload and process a PDF file containing voucher codes."""
-        logger.info(f"User {user.username} uploading voucher PDF file: {file.filename} with type: {voucher_type}gb")
+    def validate_upload(filename: str, voucher_type: str, user: User) -> tuple[int, int, int]:
+        """Check permissions, file type and voucher type; returns amount, validity_days, value."""
+        logger.info(f"User {user.username} uploading voucher PDF file: {filename} with type: {voucher_type}gb")
 
         if not user.is_admin:
             logger.warning(f"Unauthorized attempt to upload vouchers by {user.username}")
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
 
         # Validate file type
-        if not file.filename.endswith('.pdf'):
-            logger.warning(f"Invalid file type uploaded: {file.filename}")
+        if not filename or not filename.endswith('.pdf'):
+            logger.warning(f"Invalid file type uploaded: {filename}")
             raise HTTPException(status_code=400, detail="Only PDF files (.pdf) are supported")
 
         # Process voucher type
         amount, validity_days, value = VoucherUploadController._process_voucher_type(voucher_type)
 
-        logger.info(f"User {user.username} uploading voucher PDF file: {file.filename} with type: {voucher_type}gb and amount: {amount}")
-
-        try:
-            # Read and extract codes
-            contents = file.file.read()
-            unique_codes = VoucherUploadController._extract_voucher_codes(contents)
-
-            uploaded_count = 0
-            failed_count = 0
-            failed_codes = []
-
-            # Process each code
-            for code in unique_codes:
-                try:
-                    if db.query(Voucher).filter(Voucher.code == code).first():
-                        logger.warning(f"Duplicate voucher code found: {code}")
-                        failed_codes.append(code)
-                        failed_count += 1
-                        continue
-
-                    voucher = Voucher(
-                        code=code,
-                        amount=amount,
-                        validity_days=validity_days,
-                        value=value,
-                        user_id=user.id,
-                        is_used=False
-                    )
-                    db.add(voucher)
-                    uploaded_count += 1
-                except Exception as e:
-                    logger.error(f"Failed to add voucher {code}: {str(e)}")
-                    failed_codes.append(code)
-                    failed_count += 1
+        logger.info(f"User {user.username} uploading voucher PDF file: {filename} with type: {voucher_type}gb and amount: {amount}")
+        return amount, validity_days, value
 
+    @staticmethod
+    def process_upload(
+            db: Session,
+            contents: bytes,
+            amount: int,
+            validity_days: int,
+            value: int,
+            user_id: int,
+            progress: Optional[Callable[..., None]] = None,
+            page_count: Optional[int] = None
+    ) -> UploadVouchersResponse:
+        """Stream codes page by page into chunked bulk inserts, committing per chunk.
+
+        ``page_count`` saves parsing the document again when the caller has
+        counted its pages. ``progress`` is called after every page with pages_parsed, codes_found,
+        codes_inserted and duplicates.
+        """
+        values = {
+            "amount": amount,
+            "validity_days": validity_days,
+            "value": value,
+            "user_id": user_id,
+            "is_used": False,
+            "is_reserved": False,
+        }
+        seen = set()
+        pending = []
+        failed_codes = []
+        uploaded_count = 0
+
+        def flush():
+            nonlocal uploaded_count
+            inserted_codes = bulk_insert_vouchers(db, pending, values)
+            if inserted_codes:
+                db.execute(stock_adjustment(db, amount, free=len(inserted_codes)))
+            uploaded_count += len(inserted_codes)
+            failed_codes.extend(code for code in pending if code not in inserted_codes)
+            pending.clear()
+            if progress:
+                # Committed with the chunk, so a job that fails later records what it inserted
+                progress(codes_inserted=uploaded_count, duplicates=len(failed_codes))
             db.commit()
-            logger.info(f"Uploaded {uploaded_count} vouchers, {failed_count} failed by {user.username}")
-            return UploadVouchersResponse(
-                message=f"Processed {uploaded_count + failed_count} vouchers",
-                uploaded_count=uploaded_count,
-                failed_count=failed_count,
-                failed_codes=failed_codes
-            )
 
+        try:
+            for page_number, page_codes in iter_voucher_codes(contents, page_count):
+                for code in page_codes:
+                    if code not in seen:  # Remove duplicates within the document
+                        seen.add(code)
+                        pending.append(code)
+                if len(pending) >= BULK_INSERT_CHUNK_SIZE:
+                    flush()
+                if progress:
+                    progress(pages_parsed=page_number, codes_found=len(seen),
+                             codes_inserted=uploaded_count, duplicates=len(failed_codes))
+            if pending:
+                flush()
         except Exception as e:
+            db.rollback()
             logger.error(f"Error processing upload: {str(e)}")
             raise HTTPException(status_code=400, detail=f"Failed to process upload: {str(e)}")
-        finally:
-            file.file.close()
 
+        if not seen:
+            logger.warning("No voucher codes found in PDF")
+            raise HTTPException(status_code=400, detail="No voucher codes found in PDF")
+
+        failed_count = len(failed_codes)
+        if failed_codes:
+            logger.warning(f"{failed_count} duplicate voucher codes skipped: {failed_codes}")
+        if progress:
+            progress(codes_inserted=uploaded_count, duplicates=failed_count)
+        logger.info(f"Uploaded {uploaded_count} vouchers, {failed_count} failed")
+        return UploadVouchersResponse(
+            message=f"Processed {uploaded_count + failed_count} vouchers",
+            uploaded_count=uploaded_count,
+            failed_count=failed_count,
+            failed_codes=failed_codes
+        )
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from config.setting import app_settings
+from models.user import User
+from models.webhook_event import WebhookEvent
+from utils.metrics import Counter, Gauge, Histogram
+from utils.session import SessionManager as DBSession, AsyncSessionManager as AsyncDBSession
+from utils.sql import claim_row
+
+EVENT_PENDING = "pending"
+EVENT_PROCESSING = "processing"
+EVENT_PROCESSED = "processed"
+EVENT_FAILED = "failed"
+EVENT_IGNORED = "ignored"
+
+webhook_events_total = Counter(
+    "webhook_events_total", "Webhook events by final inbox status", ["event", "status"])
+webhook_processing_lag_seconds = Histogram(
+    "webhook_processing_lag_seconds", "Time from webhook receipt to successful processing", ["event"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0))
+webhook_oldest_pending_seconds = Gauge(
+    "webhook_oldest_pending_seconds", "Age of the oldest webhook event still waiting to be processed")
+
+# event name -> handler(event) returning True when the event was fulfilled
+EVENT_HANDLERS: Dict[str, Callable[[dict], bool]] = {}
+
+_inbox_signal = asyncio.Event()
+
+
+class WebhookInboxController:
+
+    @staticmethod
+    def register_handler(event: str, handler: Callable[[dict], bool]) -> None:
+        EVENT_HANDLERS[event] = handler
+
+    @staticmethod
+    async def store_event(event: dict, payload: bytes) -> bool:
+        """Persist a verified webhook event; returns False for a duplicate delivery."""
+        event_name = event.get("event", "")
+        reference = (event.get("data") or {}).get("reference") or hashlib.sha256(payload).hexdigest()
+        handled = event_name in EVENT_HANDLERS
+        now = datetime.now()
+        inbox_event = WebhookEvent(
+            event=event_name,
+            reference=str(reference),
+            payload=payload.decode("utf-8"),
+            status=EVENT_PENDING if handled else EVENT_IGNORED,
+            received_at=now,
+            next_attempt_at=now,
+        )
+        async with AsyncDBSession() as db:
+            db.add(inbox_event)
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+                logger.info(f"Duplicate webhook event {event_name} for reference {reference} ignored")
+                webhook_events_total.inc(event=event_name, status="duplicate")
+                return False
+
+        logger.info(f"Webhook event {event_name} for reference {reference} stored in inbox")
+        if handled:
+            _inbox_signal.set()
+        else:
+            webhook_events_total.inc(event=event_name, status=EVENT_IGNORED)
+        return True
+
+    @staticmethod
+    def process_next_event() -> bool:
+        """Claim and process one due inbox event; returns False when none is due."""
+        now = datetime.now()
+        with DBSession() as db:
+            event_id = claim_row(
+                db,
+                WebhookEvent,
+                criteria=[
+                    WebhookEvent.status.in_([EVENT_PENDING, EVENT_PROCESSING]),
+                    WebhookEvent.next_attempt_at <= now,
+                ],
+                values={
+                    "status": EVENT_PROCESSING,
+                    "attempts": WebhookEvent.attempts + 1,
+                    "next_attempt_at": now + timedelta(seconds=app_settings.WEBHOOK_LEASE_SECONDS),
+                },
+                order_by=WebhookEvent.next_attempt_at,
+            )
+            if event_id is None:
+                return False
+
+            inbox_event = db.get(WebhookEvent, event_id)
+            handler = EVENT_HANDLERS.get(inbox_event.event)
+            error = None
+            try:
+                if handler is None:
+                    error = f"No handler registered for {inbox_event.event}"
+                elif not handler(json.loads(inbox_event.payload)):
+                    error = "Handler could not fulfil event"
+            except Exception as e:
+                error = str(e)
+
+            finished = datetime.now()
+            inbox_event.error = error
+            if error is None:
+                inbox_event.status = EVENT_PROCESSED
+                inbox_event.processed_at = finished
+                lag = (finished - inbox_event.received_at).total_seconds()
+                inbox_event.latency_ms = lag * 1000
+                webhook_processing_lag_seconds.observe(lag, event=inbox_event.event)
+                logger.info(f"Webhook event {inbox_event.id} ({inbox_event.reference}) processed in {lag:.3f}s")
+            elif inbox_event.attempts >= app_settings.WEBHOOK_MAX_ATTEMPTS:
+                inbox_event.status = EVENT_FAILED
+                logger.error(f"Webhook event {inbox_event.id} ({inbox_event.reference}) failed "
+                             f"after {inbox_event.attempts} attempts: {error}")
+            else:
+                inbox_event.status = EVENT_PENDING
+                inbox_event.next_attempt_at = finished + timedelta(
+                    seconds=app_settings.WEBHOOK_RETRY_DELAY_SECONDS * inbox_event.attempts)
+                logger.warning(f"Webhook event {inbox_event.id} ({inbox_event.reference}) attempt "
+                               f"{inbox_event.attempts} failed, retrying: {error}")
+            if inbox_event.status != EVENT_PENDING:
+                webhook_events_total.inc(event=inbox_event.event, status=inbox_event.status)
+            db.commit()
+            return True
+
+    @staticmethod
+    async def get_events(user: User, event_status: Optional[str] = None, limit: int = 100):
+        logger.info(f"User {user.username} requested webhook inbox events")
+        if not user.is_admin:  # Restrict to admins
+            logger.warning(f"Unauthorized attempt to get webhook events by {user.username}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+        async with AsyncDBSession(read_only=True) as db:
+            query = select(WebhookEvent).order_by(WebhookEvent.id.desc()).limit(limit)
+            if event_status:
+                query = query.where(WebhookEvent.status == event_status)
+            events = (await db.execute(query)).scalars().all()
+            return [inbox_event.to_dict() for inbox_event in events]
+
+
+async def run_webhook_worker(worker_id: int) -> None:
+    """Drain the webhook inbox until cancelled, waking early when an event arrives."""
+    logger.info(f"Webhook worker {worker_id} started")
+    while True:
+        try:
+            if await run_in_threadpool(WebhookInboxController.process_next_event):
+                continue
+        except Exception as e:
+            logger.error(f"Webhook worker {worker_id}: error processing inbox: {str(e)}")
+        try:
+            await asyncio.wait_for(_inbox_signal.wait(), timeout=app_settings.WEBHOOK_POLL_INTERVAL_SECONDS)
+            _inbox_signal.clear()
+        except asyncio.TimeoutError:
+            pass
+
+
+def _oldest_pending_age() -> dict:
+    """Grows while workers are stuck or behind; the lag histogram only sees finished events."""
+    try:
+        with DBSession() as db:
+            oldest = db.execute(
+                select(func.min(WebhookEvent.received_at)).where(WebhookEvent.status == EVENT_PENDING)
+            ).scalar()
+    except Exception as e:
+        logger.error(f"Controller: Error reading webhook inbox age for metrics: {str(e)}")
+        return {}
+    return {(): (datetime.now() - oldest).total_seconds() if oldest else 0.0}
+
+
+webhook_oldest_pending_seconds.set_function(_oldest_pending_age)
@@ -1,15 +1,34 @@
-from fastapi import FastAPI, responses
+import asyncio
+import hmac
+from typing import Optional
+
+from fastapi import FastAPI, Header, responses
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from core import setup as db_setup
-from api.v1.router import user, auth, voucher
+from core.middleware import (
+    MetricsMiddleware, ProfilingMiddleware, QueryStatsMiddleware, ReadAfterWriteMiddleware,
+)
+from api.v1.router import user, auth, voucher, health
 from config.setting import app_settings
+from cron.config import cron_settings
+from cron import task as cron_task  # noqa: F401  registers the scheduled jobs
+from cron.scheduler import scheduler
+from controller.webhook_inbox import run_webhook_worker
+from controller import upload_jobs, voucher_archive
+from controller.voucher_stock import VoucherStockController
+from controller.auth import listen_for_token_revocations
+from utils.paystack import paystack_client
+from utils import passwords, pdf
+from utils.metrics import PROMETHEUS_CONTENT_TYPE, registry
 
 
 class AppBuilder:
     def __init__(self):
         self._app = FastAPI(title=app_settings.API_NAME,
-                            description=app_settings.API_DESCRIPTION,redirect_slashes=False
+                            description=app_settings.API_DESCRIPTION,redirect_slashes=False,
+                            default_response_class=ORJSONResponse
                             )
 
     def register_routes(self):
@@ -30,6 +49,11 @@ class AppBuilder:
             prefix=app_settings.API_PREFIX,
             tags=["Voucher"])
 
+        self._app.include_router(
+            health.health_router,
+            prefix=app_settings.API_PREFIX,
+            tags=["Health"])
+
         @self._app.get("/", include_in_schema=False)
         def index():
             return responses.RedirectResponse(url="/docs")
@@ -37,6 +61,9 @@ class AppBuilder:
 
     def register_database(self) -> None:
         db_setup.Base.metadata.create_all(bind=db_setup.database.get_engine())
+        VoucherStockController.initialize()
+        upload_jobs.UploadJobController.fail_interrupted_jobs()
+        voucher_archive.VoucherArchiveController.fail_interrupted_jobs()
 
     def register_middleware(self)-> None:
         self._app.add_middleware(
@@ -45,10 +72,61 @@ class AppBuilder:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=["X-Next-Cursor", "X-Total-Count", "X-DB-Query-Count", "X-DB-Query-Time-Ms",
+                            "X-Read-After-Write"],
         )
+        self._app.add_middleware(QueryStatsMiddleware)
+        if db_setup.database.has_replica() or db_setup.async_database.has_replica():
+            self._app.add_middleware(ReadAfterWriteMiddleware)
+        if app_settings.PROFILING_ENABLED:
+            # Not installed at all when off, so unprofiled deployments pay nothing
+            self._app.add_middleware(ProfilingMiddleware)
+
+    def register_metrics(self) -> None:
+        """Per-route request metrics and the Prometheus scrape endpoint"""
+        if not app_settings.METRICS_ENABLED:
+            return
+        self._app.add_middleware(MetricsMiddleware)
+
+        @self._app.get(app_settings.METRICS_PATH, include_in_schema=False)
+        def metrics(authorization: Optional[str] = Header(None)):
+            if app_settings.METRICS_TOKEN and not hmac.compare_digest(
+                    (authorization or "").encode(), f"Bearer {app_settings.METRICS_TOKEN}".encode()):
+                return responses.Response(status_code=401)
+            return responses.Response(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    def register_tasks(self) -> None:
+        background_tasks = []
+
+        async def start_tasks():
+            if cron_settings.SCHEDULER_ENABLED:
+                background_tasks.append(asyncio.create_task(scheduler.run()))
+            if app_settings.AUTH_INVALIDATION_REDIS_URL:
+                background_tasks.append(asyncio.create_task(listen_for_token_revocations()))
+            for worker_id in range(app_settings.WEBHOOK_WORKERS):
+                background_tasks.append(asyncio.create_task(run_webhook_worker(worker_id)))
+
+        async def stop_tasks():
+            for background_task in background_tasks:
+                background_task.cancel()
+            await asyncio.gather(*background_tasks, return_exceptions=True)
+            background_tasks.clear()
+            paystack_client.close()
+            upload_jobs.shutdown_executor()
+            voucher_archive.shutdown_executor()
+            pdf.shutdown_executor()
+            passwords.shutdown_executor()
+            await db_setup.async_database.get_engine().dispose()
+            if db_setup.async_database.has_replica():
+                await db_setup.async_database.get_read_engine().dispose()
+
+        self._app.add_event_handler("startup", start_tasks)
+        self._app.add_event_handler("shutdown", stop_tasks)
 
     def get_app(self):
         self.register_routes()
         self.register_database()
         self.register_middleware()
+        self.register_metrics()
+        self.register_tasks()
         return self._app
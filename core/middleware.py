@@ -0,0 +1,201 @@
+import hashlib
+import hmac
+import random
+import time
+from typing import Optional
+
+from loguru import logger
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.setting import app_settings
+from controller.auth import SECRET_KEY, is_admin_bearer
+from utils.metrics import Counter, Histogram
+from utils.profiling import finish_profiler, request_in_flight, try_start_profiler
+from utils.query_stats import QueryStats, current_query_stats
+from utils.request_threads import current_thread_group
+from utils.session import ReadAfterWrite, current_read_after_write
+
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests by route template, method and status", ["method", "route", "status"])
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"])
+
+# Requests that matched no route share one label instead of one series per URL
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope: Scope) -> str:
+    """The matched route's path template (``/api/v1/voucher/{voucher_id}``), not the raw path."""
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Counts requests and records latency per route template, method and status.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streamed responses are timed to
+    their last chunk and nothing is buffered.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            labels = {"method": scope["method"], "route": route_template(scope), "status": status_code}
+            http_requests_total.inc(**labels)
+            http_request_duration_seconds.observe(time.perf_counter() - started, **labels)
+
+
+class QueryStatsMiddleware:
+    """Counts SQL statements and database time per request and logs them.
+
+    With QUERY_STATS_HEADERS the totals up to the start of the response are
+    returned as X-DB-Query-Count and X-DB-Query-Time-Ms.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope)
+        token = current_query_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if app_settings.QUERY_STATS_HEADERS:
+                    headers = MutableHeaders(scope=message)
+                    headers["X-DB-Query-Count"] = str(stats.count)
+                    headers["X-DB-Query-Time-Ms"] = f"{stats.duration * 1000:.1f}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_query_stats.reset(token)
+            if stats.count:
+                logger.info(f"Request: {scope['method']} {route_template(scope)} {status_code}: "
+                            f"{stats.count} queries in {stats.duration * 1000:.1f}ms")
+
+
+READ_AFTER_WRITE_COOKIE = "read_after_write"
+READ_AFTER_WRITE_HEADER = "X-Read-After-Write"
+
+
+def sign_read_pin(expires_at: int) -> str:
+    signature = hmac.new(SECRET_KEY.encode(), f"read-after-write:{expires_at}".encode(), hashlib.sha256)
+    return f"{expires_at}.{signature.hexdigest()[:32]}"
+
+
+def valid_read_pin(pin: Optional[str]) -> bool:
+    expires_at, _, _ = (pin or "").partition(".")
+    return (expires_at.isdigit() and int(expires_at) > time.time()
+            and hmac.compare_digest(sign_read_pin(int(expires_at)), pin))
+
+
+class ReadAfterWriteMiddleware:
+    """Keeps a client's reads on the primary for READ_AFTER_WRITE_SECONDS after it writes,
+    whichever worker serves them.
+
+    A response to a request that committed a write carries a signed, expiring pin as
+    a cookie and as X-Read-After-Write; requests sending either one back skip the
+    replica. Installed only when a replica is configured.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        pin = connection.headers.get(READ_AFTER_WRITE_HEADER) or connection.cookies.get(READ_AFTER_WRITE_COOKIE)
+        state = ReadAfterWrite(pinned=valid_read_pin(pin))
+        token = current_read_after_write.set(state)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and state.wrote:
+                ttl = int(app_settings.READ_AFTER_WRITE_SECONDS)
+                new_pin = sign_read_pin(int(time.time()) + ttl)
+                headers = MutableHeaders(scope=message)
+                headers[READ_AFTER_WRITE_HEADER] = new_pin
+                headers.append("set-cookie", f"{READ_AFTER_WRITE_COOKIE}={new_pin}; Max-Age={ttl}; "
+                                             f"Path=/; HttpOnly; SameSite=Lax")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_read_after_write.reset(token)
+
+
+class ProfilingMiddleware:
+    """Profiles a PROFILE_SAMPLE_RATE share of requests, and admin requests sent
+    with ``X-Profile: 1``, storing each one's hottest functions per route."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    @staticmethod
+    def _trigger(scope: Scope) -> Optional[str]:
+        headers = Headers(scope=scope)
+        if headers.get("x-profile") == "1" and is_admin_bearer(headers.get("authorization")):
+            return "header"
+        if app_settings.PROFILE_SAMPLE_RATE and random.random() < app_settings.PROFILE_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with request_in_flight():
+            await self._serve(scope, receive, send)
+
+    async def _serve(self, scope: Scope, receive: Receive, send: Send) -> None:
+        trigger = self._trigger(scope)
+        profiler = try_start_profiler() if trigger else None
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        token = current_thread_group.set(profiler.threads)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_thread_group.reset(token)
+            finish_profiler(profiler, route_template(scope), scope["method"], status_code, trigger)
@@ -1,16 +1,143 @@
-from sqlalchemy.engine import create_engine
+import time
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import create_engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
 
 from config.setting import app_settings
+from utils.metrics import Gauge
+
+replica_lag_seconds = Gauge("db_replica_lag_seconds", "Last measured read replica lag", ["path"])
+db_pool_size = Gauge("db_pool_size", "Configured connection pool size", ["pool"])
+db_pool_checked_out = Gauge("db_pool_checked_out", "Connections currently in use", ["pool"])
+db_pool_overflow = Gauge("db_pool_overflow", "Connections open beyond the pool size (negative while below it)", ["pool"])
+
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# Seconds the standby is behind the primary; 0 once it has replayed all WAL it
+# received, so a quiet primary does not show up as lag
+REPLICA_LAG_QUERIES = {
+    "postgresql": text(
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    ),
+}
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": app_settings.DB_POOL_SIZE,
+        "max_overflow": app_settings.DB_MAX_OVERFLOW,
+        "pool_timeout": app_settings.DB_POOL_TIMEOUT,
+        "pool_recycle": app_settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": app_settings.DB_POOL_PRE_PING,
+    }
+
+
+def _with_async_driver(database_url: str) -> str:
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend: {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def get_async_database_url() -> str:
+    """ASYNC_DATABASE_URL if set, otherwise DATABASE_URL with its async driver."""
+    return app_settings.ASYNC_DATABASE_URL or _with_async_driver(app_settings.DATABASE_URL)
+
+
+def get_async_read_replica_url() -> Optional[str]:
+    """ASYNC_READ_REPLICA_URL if set, otherwise READ_REPLICA_URL with its async driver."""
+    if app_settings.ASYNC_READ_REPLICA_URL:
+        return app_settings.ASYNC_READ_REPLICA_URL
+    return _with_async_driver(app_settings.READ_REPLICA_URL) if app_settings.READ_REPLICA_URL else None
+
+
+def _pool_status(pool) -> dict:
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": app_settings.DB_MAX_OVERFLOW,
+    }
+
+
+class ReplicaLag:
+    """Last measured lag of a read replica, re-measured at most every
+    REPLICA_LAG_CHECK_SECONDS; a failed check counts as too far behind."""
+
+    def __init__(self, path: str, backend: str) -> None:
+        self.path = path
+        self.query = REPLICA_LAG_QUERIES.get(backend)
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+        self._checked_at = float("-inf")
+
+    def due(self) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at < app_settings.REPLICA_LAG_CHECK_SECONDS:
+            return False
+        # Claimed up front so concurrent requests keep using the previous result
+        self._checked_at = now
+        return True
+
+    def record(self, lag: Optional[float], error: Optional[str] = None) -> None:
+        if error is not None:
+            logger.warning(f"Database: Replica lag check failed on {self.path} path: {error}")
+            self.lag, self.error = None, error
+            return
+        # NULL means the server is not replaying WAL at all, i.e. it is a primary
+        self.lag, self.error = float(lag or 0), None
+        replica_lag_seconds.set(self.lag, path=self.path)
+
+    def healthy(self) -> bool:
+        return self.lag is not None and self.lag <= app_settings.REPLICA_MAX_LAG_SECONDS
+
+    def status(self) -> dict:
+        return {"lag_seconds": self.lag, "healthy": self.healthy(), "error": self.error}
 
 
 class DatabaseSetup:
     def __init__(self) -> None:
-        self._engine = create_engine(app_settings.DATABASE_URL)
+        self._engine = create_engine(app_settings.DATABASE_URL, **_pool_options())
         self._session_maker = sessionmaker(
             autocommit=False, autoflush=False, bind=self._engine)
         self._base = declarative_base()
+        self._read_engine = None
+        if app_settings.READ_REPLICA_URL:
+            self._read_engine = create_engine(app_settings.READ_REPLICA_URL, **_pool_options())
+            self._read_session_maker = sessionmaker(
+                autocommit=False, autoflush=False, bind=self._read_engine)
+            self.replica_lag = ReplicaLag("sync", self._read_engine.dialect.name)
+
+    def has_replica(self) -> bool:
+        return self._read_engine is not None
+
+    def get_read_session(self) -> Optional[sessionmaker]:
+        """Replica session factory while the replica is within REPLICA_MAX_LAG_SECONDS, else None."""
+        query = self.replica_lag.query
+        if self.replica_lag.due():
+            try:
+                with self._read_engine.connect() as connection:
+                    lag = connection.execute(query).scalar() if query is not None else 0
+                self.replica_lag.record(lag)
+            except Exception as e:
+                self.replica_lag.record(None, error=str(e))
+        return self._read_session_maker if self.replica_lag.healthy() else None
+
+    def get_read_engine(self):
+        return self._read_engine
 
     def get_base(self):
         return self._base
@@ -21,6 +148,89 @@ class DatabaseSetup:
     def get_engine(self):
         return self._engine
 
+    def get_pool_status(self) -> dict:
+        return _pool_status(self._engine.pool)
+
+    def get_replica_status(self) -> Optional[dict]:
+        if self._read_engine is None:
+            return None
+        return {**_pool_status(self._read_engine.pool), **self.replica_lag.status()}
+
+
+class AsyncDatabaseSetup:
+    """asyncio engine for the request path; DatabaseSetup stays the sync path
+    used by alembic, scripts and the remaining sync controllers."""
+
+    def __init__(self) -> None:
+        self._engine = create_async_engine(
+            get_async_database_url(), poolclass=AsyncAdaptedQueuePool, **_pool_options())
+        self._session_maker = async_sessionmaker(
+            self._engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        self._read_engine = None
+        read_replica_url = get_async_read_replica_url()
+        if read_replica_url:
+            self._read_engine = create_async_engine(
+                read_replica_url, poolclass=AsyncAdaptedQueuePool, **_pool_options())
+            self._read_session_maker = async_sessionmaker(
+                self._read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+            self.replica_lag = ReplicaLag("async", self._read_engine.dialect.name)
+
+    def has_replica(self) -> bool:
+        return self._read_engine is not None
+
+    async def get_read_session(self) -> Optional[async_sessionmaker]:
+        """Replica session factory while the replica is within REPLICA_MAX_LAG_SECONDS, else None."""
+        query = self.replica_lag.query
+        if self.replica_lag.due():
+            try:
+                async with self._read_engine.connect() as connection:
+                    lag = (await connection.execute(query)).scalar() if query is not None else 0
+                self.replica_lag.record(lag)
+            except Exception as e:
+                self.replica_lag.record(None, error=str(e))
+        return self._read_session_maker if self.replica_lag.healthy() else None
+
+    def get_read_engine(self):
+        return self._read_engine
 
+    def get_session(self) -> async_sessionmaker:
+        return self._session_maker
+
+    def get_engine(self):
+        return self._engine
+
+    def get_pool_status(self) -> dict:
+        return _pool_status(self._engine.sync_engine.pool)
+
+    def get_replica_status(self) -> Optional[dict]:
+        if self._read_engine is None:
+            return None
+        return {**_pool_status(self._read_engine.sync_engine.pool), **self.replica_lag.status()}
+
+
+# One engine (and therefore one connection pool) per process for each path;
+# everything else must go through these instances instead of building its own.
 database = DatabaseSetup()
+async_database = AsyncDatabaseSetup()
 Base = database.get_base()
+
+
+def get_pool_statuses() -> dict:
+    """Pool usage of every engine in this process, keyed by pool name."""
+    statuses = {"sync": database.get_pool_status(), "async": async_database.get_pool_status()}
+    if database.has_replica():
+        statuses["sync_replica"] = database.get_replica_status()
+    if async_database.has_replica():
+        statuses["async_replica"] = async_database.get_replica_status()
+    return statuses
+
+
+def _pool_field(field: str):
+    def collect() -> dict:
+        return {(pool,): status[field] for pool, status in get_pool_statuses().items()}
+    return collect
+
+
+db_pool_size.set_function(_pool_field("size"))
+db_pool_checked_out.set_function(_pool_field("checked_out"))
+db_pool_overflow.set_function(_pool_field("overflow"))
@@ -0,0 +1,11 @@
+"""Run the maintenance scheduler on its own: ``python -m cron``.
+
+Set SCHEDULER_ENABLED=false on the web workers when running it this way.
+"""
+import asyncio
+
+from cron import task  # noqa: F401  registers the jobs
+from cron.scheduler import scheduler
+
+if __name__ == "__main__":
+    asyncio.run(scheduler.run())
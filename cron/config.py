@@ -0,0 +1,34 @@
+from pydantic_settings import BaseSettings
+
+
+class CronSettings(BaseSettings):
+    # Scheduler: jobs run in the process holding the advisory lock SCHEDULER_LOCK_KEY
+    # (PostgreSQL); standby processes retry every SCHEDULER_LEADER_RETRY_SECONDS
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_LOCK_KEY: int = 7206101
+    SCHEDULER_LEADER_RETRY_SECONDS: int = 15
+
+    # Verify held payments with Paystack, completing purchases whose webhook was lost
+    PAYMENT_RECONCILE_ENABLED: bool = True
+    PAYMENT_RECONCILE_INTERVAL_SECONDS: int = 300
+
+    RESERVATION_SWEEP_ENABLED: bool = True
+    RESERVATION_SWEEP_INTERVAL_SECONDS: int = 60
+    # Flag sold vouchers whose validity_days have run out
+    VOUCHER_EXPIRY_ENABLED: bool = True
+    VOUCHER_EXPIRY_INTERVAL_SECONDS: int = 300
+    # Archive vouchers sold more than ARCHIVE_AFTER_DAYS ago
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_INTERVAL_SECONDS: int = 3600
+    ARCHIVE_AFTER_DAYS: int = 30
+    # Recount the voucher_stock counters from the vouchers table. Off by default:
+    # every write path keeps the counters exact, and each denomination's
+    # writers wait while it is counted
+    STOCK_RECONCILE_ENABLED: bool = False
+    STOCK_RECONCILE_INTERVAL_SECONDS: int = 3600
+
+    class config:
+        env_file = ".env"
+
+
+cron_settings = CronSettings()
@@ -0,0 +1,161 @@
+"""In-process scheduler for periodic maintenance jobs.
+
+Jobs are plain sync functions returning the number of rows they touched;
+they run in the thread pool so the event loop stays free. With several
+worker processes (or a standalone ``python -m cron``) only the one
+holding a PostgreSQL advisory lock runs jobs; the others stay on standby and
+take over if the leader's connection goes away. Other backends have no
+cross-process lock, so every process considers itself leader there.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.pool import NullPool
+from starlette.concurrency import run_in_threadpool
+
+from config.setting import app_settings
+from cron.config import cron_settings
+from utils.metrics import Counter, Gauge, Histogram
+
+cron_job_duration_seconds = Histogram("cron_job_duration_seconds", "Scheduled job run time", ["job"])
+cron_job_runs_total = Counter("cron_job_runs_total", "Scheduled job runs", ["job", "result"])
+cron_job_rows_total = Counter("cron_job_rows_total", "Rows touched by scheduled jobs", ["job"])
+cron_job_last_success = Gauge(
+    "cron_job_last_success_timestamp_seconds", "Unix time of each job's last successful run", ["job"])
+cron_leader = Gauge("cron_leader", "1 while this process runs the scheduled jobs")
+
+
+class Job:
+    def __init__(self, name: str, func: Callable[[], Optional[int]], interval_seconds: float) -> None:
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.next_run = time.monotonic()
+        self.last_started_at: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.last_rows: Optional[int] = None
+        self.last_error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "interval_seconds": self.interval_seconds,
+            "next_run_in": max(0.0, self.next_run - time.monotonic()),
+            "last_started_at": self.last_started_at,
+            "last_duration": self.last_duration,
+            "last_rows": self.last_rows,
+            "last_error": self.last_error,
+        }
+
+
+class LeaderLock:
+    """Session-level ``pg_try_advisory_lock`` held on a dedicated connection."""
+
+    def __init__(self, database_url: str, key: int, name: str = "scheduler leadership") -> None:
+        self.key = key
+        self.name = name
+        self.enabled = make_url(database_url).get_backend_name() == "postgresql"
+        # Autocommit: the held connection must never sit idle in a transaction, or
+        # idle_in_transaction_session_timeout would end it and the leadership with it
+        self._engine = create_engine(
+            database_url, poolclass=NullPool, isolation_level="AUTOCOMMIT") if self.enabled else None
+        self._connection = None
+
+    def acquire(self) -> bool:
+        """True while this process is leader; re-checks the held connection every call."""
+        if not self.enabled:
+            return True
+        try:
+            if self._connection is not None:
+                self._connection.execute(text("SELECT 1"))
+                return True
+            connection = self._engine.connect()
+            if connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar():
+                self._connection = connection
+                logger.info(f"Cron: Acquired {self.name} (lock {self.key})")
+                return True
+            connection.close()
+            return False
+        except Exception as e:
+            logger.error(f"Cron: Lost {self.name}: {str(e)}")
+            self.release()
+            return False
+
+    def release(self) -> None:
+        if self._connection is not None:
+            try:
+                # Closing the session releases the advisory lock with it
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+
+class Scheduler:
+    def __init__(self, leader_lock: LeaderLock) -> None:
+        self.jobs: Dict[str, Job] = {}
+        self.leader_lock = leader_lock
+        self.is_leader = False
+
+    def register(self, name: str, func: Callable[[], Optional[int]], interval_seconds: float,
+                 enabled: bool = True) -> None:
+        if name in self.jobs:
+            raise ValueError(f"Job {name} already registered")
+        if not enabled:
+            logger.info(f"Cron: Job {name} disabled")
+            return
+        self.jobs[name] = Job(name, func, interval_seconds)
+
+    def run_job(self, job: Job) -> None:
+        job.last_started_at = datetime.now()
+        started = time.perf_counter()
+        try:
+            rows = job.func() or 0
+            job.last_rows, job.last_error = rows, None
+            cron_job_runs_total.inc(job=job.name, result="success")
+            cron_job_rows_total.inc(rows, job=job.name)
+            cron_job_last_success.set(time.time(), job=job.name)
+            if rows:
+                logger.info(f"Cron: Job {job.name} touched {rows} rows")
+        except Exception as e:
+            job.last_error = str(e)
+            cron_job_runs_total.inc(job=job.name, result="error")
+            logger.error(f"Cron: Job {job.name} failed: {str(e)}")
+        finally:
+            job.last_duration = time.perf_counter() - started
+            cron_job_duration_seconds.observe(job.last_duration, job=job.name)
+
+    async def run(self) -> None:
+        """Run due jobs one at a time until cancelled."""
+        logger.info(f"Cron: Scheduler started with jobs {sorted(self.jobs)}")
+        try:
+            while True:
+                self.is_leader = await run_in_threadpool(self.leader_lock.acquire)
+                cron_leader.set(1 if self.is_leader else 0)
+                if not self.is_leader:
+                    await asyncio.sleep(cron_settings.SCHEDULER_LEADER_RETRY_SECONDS)
+                    continue
+
+                now = time.monotonic()
+                for job in self.jobs.values():
+                    if job.next_run <= now:
+                        await run_in_threadpool(self.run_job, job)
+                        job.next_run = time.monotonic() + job.interval_seconds
+                next_due = min((job.next_run for job in self.jobs.values()), default=now + 60)
+                # Wake at least every leader-retry period to re-check the lock
+                await asyncio.sleep(min(max(next_due - time.monotonic(), 0.1),
+                                        cron_settings.SCHEDULER_LEADER_RETRY_SECONDS))
+        finally:
+            self.leader_lock.release()
+            cron_leader.set(0)
+
+    def status(self) -> dict:
+        return {"leader": self.is_leader, "jobs": [job.to_dict() for job in self.jobs.values()]}
+
+
+scheduler = Scheduler(LeaderLock(app_settings.DATABASE_URL, cron_settings.SCHEDULER_LOCK_KEY))
+
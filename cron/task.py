@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+from loguru import logger
+from sqlalchemy import select
+
+from controller.payment_reconciliation import ReconciliationInProgress, payment_reconciliation
+from controller.voucher_archive import ArchiveInProgress, VoucherArchiveController
+from controller.voucher_stock import VoucherStockController
+from cron.config import cron_settings
+from cron.scheduler import scheduler
+from models.voucher import Voucher
+from utils.session import SessionManager as DBSession
+from utils.sql import (
+    count_by_amount,
+    expire_vouchers_statement,
+    inventory_query,
+    release_expired_reservations_statement,
+    stock_adjustment,
+)
+
+
+def release_expired_reservations() -> int:
+    """Release every voucher hold whose reservation has expired."""
+    with DBSession() as db:
+        amounts = db.execute(release_expired_reservations_statement(datetime.now())).scalars().all()
+        for amount, released in count_by_amount(amounts).items():
+            db.execute(stock_adjustment(db, amount, held=-released, free=released))
+        db.commit()
+    if amounts:
+        logger.info(f"Cron: Released {len(amounts)} expired voucher reservations")
+        log_inventory()
+    return len(amounts)
+
+
+def log_inventory() -> None:
+    with DBSession() as db:
+        for row in db.execute(inventory_query()):
+            logger.info(f"Cron: Inventory amount={row.amount} free={row.free} held={row.held} sold={row.sold}")
+
+
+def expire_vouchers() -> int:
+    """Flag sold vouchers whose purchased_date + validity_days has passed."""
+    now = datetime.now()
+    expired = 0
+    with DBSession() as db:
+        # One indexable range condition per validity period instead of date arithmetic in SQL
+        validity_periods = db.execute(
+            select(Voucher.validity_days).where(Voucher.validity_days.isnot(None)).distinct()
+        ).scalars().all()
+        for validity_days in validity_periods:
+            expired += db.execute(expire_vouchers_statement(validity_days, now)).rowcount
+            db.commit()
+    return expired
+
+
+def archive_used_vouchers() -> int:
+    """Archive vouchers sold more than ARCHIVE_AFTER_DAYS ago."""
+    older_than = datetime.now() - timedelta(days=cron_settings.ARCHIVE_AFTER_DAYS)
+    try:
+        return VoucherArchiveController.archive_used_vouchers(older_than=older_than)
+    except ArchiveInProgress:
+        logger.info("Cron: Archival already running, skipping")
+        return 0
+
+
+def reconcile_payments() -> int:
+    """Settle held payments whose Paystack webhook never arrived."""
+    try:
+        report = payment_reconciliation.reconcile()
+    except ReconciliationInProgress:
+        logger.info("Cron: Payment reconciliation already running, skipping")
+        return 0
+    return report["finalized"] + report["released"]
+
+
+scheduler.register("reconcile_payments", reconcile_payments,
+                   cron_settings.PAYMENT_RECONCILE_INTERVAL_SECONDS, enabled=cron_settings.PAYMENT_RECONCILE_ENABLED)
+scheduler.register("release_reservations", release_expired_reservations,
+                   cron_settings.RESERVATION_SWEEP_INTERVAL_SECONDS, enabled=cron_settings.RESERVATION_SWEEP_ENABLED)
+scheduler.register("expire_vouchers", expire_vouchers,
+                   cron_settings.VOUCHER_EXPIRY_INTERVAL_SECONDS, enabled=cron_settings.VOUCHER_EXPIRY_ENABLED)
+scheduler.register("archive_used_vouchers", archive_used_vouchers,
+                   cron_settings.ARCHIVE_INTERVAL_SECONDS, enabled=cron_settings.ARCHIVE_ENABLED)
+scheduler.register("reconcile_stock", VoucherStockController.rebuild,
+                   cron_settings.STOCK_RECONCILE_INTERVAL_SECONDS, enabled=cron_settings.STOCK_RECONCILE_ENABLED)
@@ -1,3 +1,9 @@
 from .voucher import Voucher
 from .user import User
-from .database import get_db
+from .webhook_event import WebhookEvent
+from .upload_job import UploadJob
+from .archive_job import ArchiveJob
+from .voucher_stock import VoucherStock
+from .voucher_history import VoucherHistory
+from .refresh_token import RefreshToken
+from .database import get_db, get_async_db
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+
+from core.setup import Base
+
+
+class ArchiveJob(Base):
+    """A requested or scheduled archival of sold vouchers and its progress."""
+
+    __tablename__ = "archive_jobs"
+
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="queued", index=True)
+    # Only vouchers purchased before this are archived; None archives every sold voucher
+    older_than = Column(DateTime, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # None when scheduled
+    archived = Column(Integer, nullable=False, default=0)
+    batches = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # Bumped after every batch; a queued or running job that stops moving
+    # belonged to a worker that died
+    updated_at = Column(DateTime, nullable=True, default=datetime.now, onupdate=datetime.now)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "older_than": self.older_than,
+            "user_id": self.user_id,
+            "archived": self.archived,
+            "batches": self.batches,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "updated_at": self.updated_at,
+        }
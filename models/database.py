@@ -1,15 +1,7 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import os
+from core.setup import database, async_database
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+SessionLocal = database.get_session()
+AsyncSessionLocal = async_database.get_session()
 
 # Dependency to get DB session
 def get_db():
@@ -17,4 +9,10 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependency to get an asyncio DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+
+from core.setup import Base
+
+
+class RefreshToken(Base):
+    """An outstanding refresh token. Refreshing or logging out deletes the row,
+    so a token without one is rejected whichever worker sees it."""
+
+    __tablename__ = "refresh_tokens"
+
+    jti = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
@@ -0,0 +1,51 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+
+from core.setup import Base
+
+
+class UploadJob(Base):
+    """A queued voucher PDF upload and its progress."""
+
+    __tablename__ = "upload_jobs"
+
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="queued")
+    filename = Column(String, nullable=True)
+    voucher_type = Column(String, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    pages_total = Column(Integer, nullable=True)
+    pages_parsed = Column(Integer, nullable=False, default=0)
+    codes_found = Column(Integer, nullable=False, default=0)
+    codes_inserted = Column(Integer, nullable=False, default=0)
+    duplicates = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)  # UploadVouchersResponse as JSON
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # Bumped by every progress write; a queued or running job that stops
+    # moving belonged to a worker that died
+    updated_at = Column(DateTime, nullable=True, default=datetime.now, onupdate=datetime.now)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "voucher_type": self.voucher_type,
+            "user_id": self.user_id,
+            "pages_total": self.pages_total,
+            "pages_parsed": self.pages_parsed,
+            "codes_found": self.codes_found,
+            "codes_inserted": self.codes_inserted,
+            "duplicates": self.duplicates,
+            "error": self.error,
+            "result": json.loads(self.result) if self.result else None,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "updated_at": self.updated_at,
+        }
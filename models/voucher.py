@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, func, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, func, Float, Index
 
 from core.setup import Base
 
@@ -11,10 +11,28 @@ class Voucher(Base):
     value = Column(Integer)
     validity_days = Column(Integer)
     is_used = Column(Boolean, default=False)
+    is_reserved = Column(Boolean, default=False)
+    reserved_until = Column(DateTime, nullable=True)
+    # Set by the scheduler once purchased_date + validity_days has passed
+    is_expired = Column(Boolean, default=False)
     purchased_date = Column(DateTime,nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     reference = Column(String, unique=True, nullable=True)
 
+    # Mirrored by alembic/versions/*_purchase_path_indexes.py for existing databases
+    __table_args__ = (
+        Index("ix_vouchers_amount_is_used", "amount", "is_used"),
+        Index("ix_vouchers_user_id_is_used_amount", "user_id", "is_used", "amount"),
+        # Allocation takes the lowest free id for an amount straight off this index
+        Index("ix_vouchers_free_amount_id", "amount", "id",
+              postgresql_where=(is_used == False) & is_reserved.isnot(True),
+              sqlite_where=(is_used == False) & is_reserved.isnot(True)),
+        # Only live holds, for the reservation sweeper
+        Index("ix_vouchers_held_reserved_until", "reserved_until",
+              postgresql_where=(is_used == False) & (is_reserved == True),
+              sqlite_where=(is_used == False) & (is_reserved == True)),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -26,4 +44,7 @@ class Voucher(Base):
             "reference": self.reference,
             "user_id": self.user_id,
             "is_used": self.is_used,
+            "is_reserved": self.is_reserved,
+            "reserved_until": self.reserved_until,
+            "is_expired": self.is_expired,
         }
\ No newline at end of file
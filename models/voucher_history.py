@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float
+
+from core.setup import Base
+
+
+class VoucherHistory(Base):
+    """A sold voucher moved out of ``vouchers`` by the archiver; ``id`` is the original voucher id."""
+
+    __tablename__ = "voucher_history"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    code = Column(String, nullable=False)
+    amount = Column(Float)
+    value = Column(Integer)
+    validity_days = Column(Integer)
+    is_used = Column(Boolean)
+    is_reserved = Column(Boolean)
+    reserved_until = Column(DateTime, nullable=True)
+    is_expired = Column(Boolean)
+    purchased_date = Column(DateTime, nullable=True)
+    user_id = Column(Integer, nullable=True, index=True)
+    reference = Column(String, nullable=True, index=True)
+    archived_at = Column(DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "code": self.code,
+            "value": self.value,
+            "amount": self.amount,
+            "validity_days": self.validity_days,
+            "purchased_date": self.purchased_date,
+            "reference": self.reference,
+            "user_id": self.user_id,
+            "is_used": self.is_used,
+            "is_expired": self.is_expired,
+            "archived_at": self.archived_at,
+        }
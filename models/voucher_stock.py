@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Float, Integer
+
+from core.setup import Base
+
+
+class VoucherStock(Base):
+    """Per-denomination voucher counts, kept in step with ``vouchers`` by every write path.
+
+    Each change to a voucher's state adjusts its row in the same transaction, so
+    stock can be read without scanning the vouchers table.
+    """
+
+    __tablename__ = "voucher_stock"
+
+    amount = Column(Float, primary_key=True)
+    free = Column(Integer, nullable=False, default=0)
+    held = Column(Integer, nullable=False, default=0)
+    sold = Column(Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "amount": self.amount,
+            "free": self.free,
+            "held": self.held,
+            "sold": self.sold,
+        }
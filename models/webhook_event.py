@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, UniqueConstraint
+
+from core.setup import Base
+
+
+class WebhookEvent(Base):
+    """Inbox row for a received Paystack webhook, drained by the webhook workers."""
+
+    __tablename__ = "webhook_events"
+    __table_args__ = (UniqueConstraint("event", "reference", name="uq_webhook_events_event_reference"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    event = Column(String, nullable=False)
+    reference = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    received_at = Column(DateTime, nullable=False, default=datetime.now)
+    # Earliest time a worker may (re)claim the row: retry backoff while
+    # pending, lease expiry while processing
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.now, index=True)
+    processed_at = Column(DateTime, nullable=True)
+    latency_ms = Column(Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "event": self.event,
+            "reference": self.reference,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "received_at": self.received_at,
+            "processed_at": self.processed_at,
+            "latency_ms": self.latency_ms,
+        }
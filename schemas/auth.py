@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel, EmailStr
 
 class UserCreate(BaseModel):
@@ -10,6 +11,11 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     is_admin: bool
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class UserLogin(BaseModel):
     username: str
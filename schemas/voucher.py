@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -34,18 +34,75 @@ class VoucherOut(VoucherUpdate):
     purchased_date : Optional[datetime] = None
     user_id: Optional[int] = None
     reference: Optional[str] = None
+    is_reserved: Optional[bool] = False
+    reserved_until: Optional[datetime] = None
+    is_expired: Optional[bool] = False
     id: int
 
     class Config:
         from_attributes = True
 
 
-class DeleteUsedVouchersResponse(BaseModel):
-    message: str
-    deleted: List[str] = []
+class ArchiveJobOut(BaseModel):
+    id: str
+    status: str
+    older_than: Optional[datetime] = None
+    user_id: Optional[int] = None
+    archived: int = 0
+    batches: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class ReconciliationReport(BaseModel):
+    started_at: datetime
+    finished_at: datetime
+    duration_seconds: float
+    checked: int
+    finalized: int
+    released: int
+    pending: int
+    skipped: int
+    errors: int
+    references: Dict[str, List[str]]
 
 class UploadVouchersResponse(BaseModel):
     message: str
     uploaded_count: int
     failed_count: int
-    failed_codes: list[str]
\ No newline at end of file
+    failed_codes: list[str]
+
+
+class VoucherFilter(BaseModel):
+    amount: Optional[float] = None
+    is_used: Optional[bool] = None
+    user_id: Optional[int] = None
+    purchased_from: Optional[datetime] = None
+    purchased_to: Optional[datetime] = None
+
+
+class VoucherInventory(BaseModel):
+    amount: float
+    free: int
+    held: int
+    sold: int
+
+
+class UploadJobOut(BaseModel):
+    id: str
+    status: str
+    filename: Optional[str] = None
+    voucher_type: str
+    pages_total: Optional[int] = None
+    pages_parsed: int = 0
+    codes_found: int = 0
+    codes_inserted: int = 0
+    duplicates: int = 0
+    error: Optional[str] = None
+    result: Optional[UploadVouchersResponse] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
@@ -0,0 +1,163 @@
+"""Benchmark serialization of the voucher and user list endpoints.
+
+Two measurements on the same page of rows:
+
+1. serialization only: the old path (validate every row against the
+   response_model, ``jsonable_encoder``, stdlib ``json``) against the
+   current one (plain row dicts straight into ``ORJSONResponse``);
+2. end to end: requests/sec and latency percentiles of
+   ``GET /api/v1/voucher`` and ``GET /api/v1/users`` through the app.
+
+Runs in-process on a throwaway SQLite database:
+
+    python script/bench_list_endpoints.py --vouchers 5000 --limit 1000
+    python script/bench_list_endpoints.py --url http://127.0.0.1:8000 --username admin --password secret
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_login import summary  # noqa: E402
+
+
+def time_per_call(func, repeat: int) -> float:
+    func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def bench_serialization(rows: list, model, repeat: int, label: str) -> None:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from pydantic import TypeAdapter
+
+    adapter = TypeAdapter(list[model])
+
+    def validated_stdlib():
+        # What FastAPI does for a response_model: validate, dump, encode, json.dumps
+        return JSONResponse(jsonable_encoder(adapter.dump_python(adapter.validate_python(rows)))).body
+
+    def direct_orjson():
+        return ORJSONResponse(rows).body
+
+    assert len(validated_stdlib()) and len(direct_orjson())
+    before, after = time_per_call(validated_stdlib, repeat), time_per_call(direct_orjson, repeat)
+    print(f"{label} serialization, {len(rows)} rows: validated+json {before * 1000:.2f}ms, "
+          f"orjson {after * 1000:.2f}ms ({before / after:.1f}x)")
+
+
+async def bench_endpoint(client: httpx.AsyncClient, path: str, headers: dict, requests: int,
+                         concurrency: int) -> None:
+    latencies, size = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch():
+        nonlocal size
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+            size = len(response.content)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(fetch() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    print(f"GET {path}: {requests / elapsed:.1f} req/s, {size} bytes, {summary(latencies)}")
+
+
+async def run(client: httpx.AsyncClient, args) -> None:
+    token = (await client.post("/api/v1/auth/token",
+                               data={"username": args.username, "password": args.password})).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    await bench_endpoint(client, f"/api/v1/voucher?limit={args.limit}", headers, args.requests, args.concurrency)
+    await bench_endpoint(client, "/api/v1/users", headers, args.requests, args.concurrency)
+
+
+def seed(args) -> None:
+    from sqlalchemy import insert
+
+    from core.setup import database
+    from models import User, Voucher
+    from utils.passwords import hash_password_sync
+
+    now = datetime.now()
+    with database.get_engine().begin() as conn:
+        conn.execute(insert(User), [
+            {"full_name": args.username, "username": args.username, "email": f"{args.username}@example.com",
+             "hashed_password": hash_password_sync(args.password), "is_active": True, "is_admin": True}
+        ] + [
+            {"full_name": f"User {i}", "username": f"user{i}", "email": f"user{i}@example.com",
+             "hashed_password": "x", "is_active": True, "is_admin": False}
+            for i in range(args.users - 1)
+        ])
+        conn.execute(insert(Voucher), [
+            {"code": f"{i:08x}", "amount": 10.0, "value": 1, "validity_days": 30, "is_used": i % 2 == 0,
+             "is_reserved": False, "user_id": 1 if i % 2 == 0 else None,
+             "reference": f"ref-{i}" if i % 2 == 0 else None, "purchased_date": now if i % 2 == 0 else None}
+            for i in range(args.vouchers)
+        ])
+
+
+def serialization_benchmarks(args) -> None:
+    from sqlalchemy import select
+
+    from core.setup import database
+    from schemas.user import UserOut
+    from schemas.voucher import VoucherOut
+    from utils.sql import USER_COLUMNS, VOUCHER_COLUMNS
+
+    with database.get_engine().connect() as conn:
+        vouchers = [row._asdict() for row in conn.execute(select(*VOUCHER_COLUMNS).limit(args.limit))]
+        users = [row._asdict() for row in conn.execute(select(*USER_COLUMNS))]
+    bench_serialization(vouchers, VoucherOut, args.repeat, "voucher list")
+    bench_serialization(users, UserOut, args.repeat, "user list")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server; default runs the app in-process")
+    parser.add_argument("--vouchers", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=1000, help="page size for the voucher list")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=50, help="iterations of each serialization benchmark")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench-password")
+    args = parser.parse_args()
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            await run(client, args)
+        return
+
+    database = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{database}")
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("SCHEDULER_ENABLED", "false")
+    from main import app
+
+    await app.router.startup()
+    try:
+        seed(args)
+        serialization_benchmarks(args)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await run(client, args)
+    finally:
+        await app.router.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
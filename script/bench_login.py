@@ -0,0 +1,106 @@
+"""Benchmark login throughput and how much a login burst slows other requests.
+
+Fires ``--logins`` concurrent password logins (``--concurrency`` at a time)
+while a probe keeps requesting a cheap endpoint, then reports logins/sec,
+login latency percentiles and probe latency percentiles. Runs against a
+server that is already up, or in-process on a throwaway SQLite database:
+
+    python script/bench_login.py --logins 200 --concurrency 32
+    python script/bench_login.py --url http://127.0.0.1:8000 --username bench --password bench
+
+Compare BCRYPT_ROUNDS / PASSWORD_HASH_WORKERS settings by re-running with
+different environment values.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def summary(values: list) -> str:
+    return (f"p50={percentile(values, 50) * 1000:.1f}ms p95={percentile(values, 95) * 1000:.1f}ms "
+            f"p99={percentile(values, 99) * 1000:.1f}ms max={max(values, default=0) * 1000:.1f}ms")
+
+
+async def run(client: httpx.AsyncClient, args) -> None:
+    await client.post("/api/v1/users", json={
+        "full_name": args.username, "username": args.username,
+        "email": f"{args.username}@example.com", "password": args.password,
+    })
+
+    login_latencies, probe_latencies, statuses = [], [], {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    done = asyncio.Event()
+
+    async def login():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/v1/auth/token", data={"username": args.username, "password": args.password})
+            login_latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.get("/docs")
+            probe_latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+
+    print(f"logins: {args.logins} in {elapsed:.2f}s = {args.logins / elapsed:.1f}/s, statuses {statuses}")
+    print(f"login latency: {summary(login_latencies)}")
+    print(f"probe latency during burst: {summary(probe_latencies)} "
+          f"(mean {statistics.mean(probe_latencies or [0]) * 1000:.1f}ms)")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server; default runs the app in-process")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench-password")
+    args = parser.parse_args()
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            await run(client, args)
+        return
+
+    database = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{database}")
+    os.environ.setdefault("SECRET_KEY", "bench")
+    from main import app
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await run(client, args)
+    finally:
+        await app.router.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
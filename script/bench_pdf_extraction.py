@@ -0,0 +1,111 @@
+"""Benchmark voucher code extraction from PDFs: pages/sec, legacy vs current.
+
+"legacy" is the original implementation (concatenate every page's text, then
+run the regex once); "current" is utils.pdf.iter_voucher_codes (per-page
+extraction fanned out over a process pool). Uses the given PDF, or generates
+a synthetic vendor batch:
+
+    python script/bench_pdf_extraction.py --pages 300
+    python script/bench_pdf_extraction.py --pdf vendor_batch.pdf --workers 4
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_pdf(pages: int, codes_per_page: int) -> bytes:
+    """A minimal multi-page PDF with one voucher code per text line."""
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pages_id = 2 + 2 * pages
+    page_ids = []
+    for _ in range(pages):
+        lines = [
+            "".join(random.choices(string.ascii_lowercase + string.digits, k=6)) + "   GHS 10.00   5 days"
+            for _ in range(codes_per_page)
+        ]
+        text = "BT /F1 10 Tf 40 780 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(text)} >>\nstream\n{text}\nendstream".encode())
+        objects.append((f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 612 792] "
+                        f"/Resources << /Font << /F1 1 0 R >> >> /Contents {len(objects)} 0 R >>").encode())
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    objects.append(f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode())
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root {len(objects)} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def legacy_extract(pdf_contents: bytes) -> set:
+    import pdfplumber
+
+    with pdfplumber.open(BytesIO(pdf_contents)) as pdf:
+        all_text = "".join(page.extract_text() or "" for page in pdf.pages)
+        return set(re.findall(r"\b[a-z0-9]{6}\b", all_text, re.MULTILINE))
+
+
+def current_extract(pdf_contents: bytes) -> set:
+    from utils.pdf import iter_voucher_codes
+
+    codes = set()
+    for _, page_codes in iter_voucher_codes(pdf_contents):
+        codes.update(page_codes)
+    return codes
+
+
+def timed(label: str, function, pdf_contents: bytes, pages: int, repeat: int) -> set:
+    best = float("inf")
+    codes = set()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        codes = function(pdf_contents)
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<8} {pages / best:8.1f} pages/sec  ({best:.2f}s, {len(codes)} codes)")
+    return codes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF file to benchmark (default: synthetic)")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--codes-per-page", type=int, default=50)
+    parser.add_argument("--workers", type=int, help="PDF_EXTRACT_WORKERS override")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.workers is not None:
+        os.environ["PDF_EXTRACT_WORKERS"] = str(args.workers)
+    from utils import pdf
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            contents = f.read()
+    else:
+        contents = synthetic_pdf(args.pages, args.codes_per_page)
+    pages = pdf.count_pages(contents)
+    print(f"{pages} pages, {len(contents) / 1024:.0f} KiB")
+
+    legacy_codes = timed("legacy", legacy_extract, contents, pages, args.repeat)
+    current_codes = timed("current", current_extract, contents, pages, args.repeat)
+    if legacy_codes - current_codes:
+        print(f"WARNING: current missed {len(legacy_codes - current_codes)} codes found by legacy")
+    pdf.shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
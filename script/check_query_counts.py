@@ -0,0 +1,88 @@
+"""Check that the main endpoints stay within their SQL statement budgets.
+
+Runs the app in-process on a throwaway SQLite database, calls each endpoint
+once inside ``utils.query_stats.assert_max_queries`` and exits non-zero when
+any of them runs more statements than its budget, listing the statements:
+
+    python script/check_query_counts.py
+    python script/check_query_counts.py --verbose
+
+Background workers and the scheduler are disabled so only the request's own
+queries are counted. Raise a budget deliberately, in the same change that
+adds the query.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (method, path, json body, maximum statements)
+BUDGETS = [
+    ("GET", "/api/v1/voucher?limit=100", None, 1),
+    ("GET", "/api/v1/voucher?limit=100&include_total=true", None, 2),
+    ("GET", "/api/v1/voucher/all_vouchers", None, 1),
+    ("GET", "/api/v1/voucher/1", None, 1),
+    ("GET", "/api/v1/voucher/stock", None, 1),
+    ("GET", "/api/v1/voucher/inventory", None, 1),
+    ("GET", "/api/v1/users", None, 1),
+    ("GET", "/api/v1/users/1", None, 1),
+    ("PUT", "/api/v1/voucher/2", {"amount": 10, "code": "budget-2", "value": 1, "validity_days": 30,
+                                  "is_used": False}, 2),
+]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vouchers", type=int, default=500)
+    parser.add_argument("--verbose", action="store_true", help="print every endpoint's count")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'queries.db')}")
+    os.environ.setdefault("SECRET_KEY", "queries")
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    os.environ["WEBHOOK_WORKERS"] = "0"
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+
+    from core.setup import database
+    from main import app
+    from models import Voucher
+    from utils.query_stats import assert_max_queries
+
+    failures = 0
+    with TestClient(app) as client:
+        client.post("/api/v1/users", json={"full_name": "budget", "username": "budget",
+                                           "email": "budget@example.com", "password": "budget", "is_admin": True})
+        token = client.post("/api/v1/auth/token", data={"username": "budget", "password": "budget"}).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+        with database.get_engine().begin() as conn:
+            conn.execute(insert(Voucher), [
+                {"code": f"budget-{i}", "amount": 10.0, "value": 1, "validity_days": 30,
+                 "is_used": False, "is_reserved": False}
+                for i in range(1, args.vouchers + 1)
+            ])
+        from controller.voucher_stock import VoucherStockController
+        VoucherStockController.rebuild()
+
+        for method, path, body, budget in BUDGETS:
+            label = f"{method} {path}"
+            try:
+                with assert_max_queries(budget, label) as stats:
+                    response = client.request(method, path, json=body, headers=headers)
+                response.raise_for_status()
+                ok = True
+            except AssertionError as e:
+                ok, failures = False, failures + 1
+                print(f"FAIL {e}")
+            if ok and args.verbose:
+                print(f"ok   {label}: {stats.count}/{budget} queries")
+
+    print(f"\n{failures} endpoint{'' if failures == 1 else 's'} over budget" if failures
+          else f"all {len(BUDGETS)} endpoints within their query budgets")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
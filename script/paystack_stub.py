@@ -0,0 +1,128 @@
+"""Minimal stand-in for the Paystack transaction API, for local and load testing.
+
+Serves ``POST /transaction/initialize`` and ``GET /transaction/verify/{reference}``
+with Paystack-shaped JSON. Point the app at it with
+``PAYSTACK_URL=http://127.0.0.1:9555/transaction``:
+
+    python script/paystack_stub.py --port 9555
+    python script/paystack_stub.py --latency-ms 150 --error-rate 0.02 --fail-rate 0.1
+
+``--latency-ms`` delays every response, ``--error-rate`` answers that share of
+requests with a 503, and ``--fail-rate`` reports that share of new transactions
+as ``failed`` instead of ``success``. Unknown references get a 404.
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+VERIFY_PATH = re.compile(r"^/transaction/verify/(?P<reference>[^/?]+)$")
+
+
+class PaystackStub:
+    def __init__(self, latency_ms: float = 0, error_rate: float = 0, fail_rate: float = 0) -> None:
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.fail_rate = fail_rate
+        self.transactions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def initialize(self, payload: dict) -> dict:
+        with self._lock:
+            reference = f"stub-{next(self._ids)}-{random.getrandbits(32):08x}"
+            self.transactions[reference] = {
+                "reference": reference,
+                "amount": payload["amount"],
+                "currency": payload.get("currency", "GHS"),
+                "customer": {"email": payload["email"]},
+                "status": "failed" if random.random() < self.fail_rate else "success",
+            }
+        return {"status": True, "message": "Authorization URL created", "data": {
+            "authorization_url": f"https://checkout.paystack.test/{reference}",
+            "access_code": reference,
+            "reference": reference,
+        }}
+
+    def verify(self, reference: str):
+        transaction = self.transactions.get(reference)
+        if transaction is None:
+            return None
+        return {"status": True, "message": "Verification successful", "data": dict(transaction)}
+
+
+def make_handler(stub: PaystackStub):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args) -> None:
+            pass
+
+        def _send(self, code: int, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _injected_error(self) -> bool:
+            if stub.latency:
+                time.sleep(stub.latency)
+            if random.random() < stub.error_rate:
+                self._send(503, {"status": False, "message": "Injected failure"})
+                return True
+            return False
+
+        def do_POST(self) -> None:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self._injected_error():
+                return
+            if self.path.rstrip("/") != "/transaction/initialize":
+                self._send(404, {"status": False, "message": "Not found"})
+                return
+            self._send(200, stub.initialize(payload))
+
+        def do_GET(self) -> None:
+            if self._injected_error():
+                return
+            match = VERIFY_PATH.match(self.path)
+            body = stub.verify(match.group("reference")) if match else None
+            if body is None:
+                self._send(404, {"status": False, "message": "Transaction reference not found"})
+                return
+            self._send(200, body)
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 9555, **options) -> ThreadingHTTPServer:
+    """Start the stub on a daemon thread and return the server (``shutdown()`` to stop)."""
+    server = ThreadingHTTPServer((host, port), make_handler(PaystackStub(**options)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9555)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="share of requests answered with a 503")
+    parser.add_argument("--fail-rate", type=float, default=0, help="share of transactions reported as failed")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, latency_ms=args.latency_ms,
+                   error_rate=args.error_rate, fail_rate=args.fail_rate)
+    print(f"Paystack stub on http://{args.host}:{args.port}/transaction")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
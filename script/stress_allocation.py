@@ -0,0 +1,93 @@
+"""Concurrency stress test for utils.sql.allocate_voucher.
+
+Seeds a batch of unused vouchers, lets many threads claim them at the same
+time through the allocation primitive, and fails if any voucher is handed out
+twice or if stock is left behind. Runs against DATABASE_URL:
+
+    python script/stress_allocation.py --vouchers 2000 --workers 64
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.setup import Base, database  # noqa: E402
+from models import User, Voucher  # noqa: E402
+from utils.session import SessionManager as DBSession  # noqa: E402
+from utils.sql import allocate_voucher  # noqa: E402
+
+
+def seed(batch: str, count: int, amount: float) -> None:
+    with DBSession() as db:
+        db.add_all([
+            Voucher(code=f"{batch}-{i}", amount=amount, value=1, validity_days=1, is_used=False)
+            for i in range(count)
+        ])
+        db.commit()
+
+
+def drain(batch: str, amount: float) -> list:
+    """Claim vouchers until none are left; returns the claimed codes."""
+    claimed = []
+    while True:
+        with DBSession() as db:
+            voucher = allocate_voucher(
+                db,
+                criteria=[Voucher.amount == amount, Voucher.is_used == False, Voucher.code.like(f"{batch}-%")],
+                values={"is_used": True, "reference": f"{batch}-ref-{uuid.uuid4().hex}"},
+            )
+            if voucher is None:
+                return claimed
+            claimed.append(voucher.code)
+
+
+def cleanup(batch: str) -> None:
+    with DBSession() as db:
+        db.query(Voucher).filter(Voucher.code.like(f"{batch}-%")).delete(synchronize_session=False)
+        db.commit()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vouchers", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--amount", type=float, default=999.0, help="denomination reserved for the test batch")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows afterwards")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=database.get_engine(), tables=[User.__table__, Voucher.__table__])
+    batch = f"stress-{uuid.uuid4().hex[:8]}"
+    seed(batch, args.vouchers, args.amount)
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(lambda _: drain(batch, args.amount), range(args.workers)))
+    finally:
+        elapsed = time.perf_counter() - started
+        if not args.keep:
+            cleanup(batch)
+
+    codes = [code for claimed in results for code in claimed]
+    duplicates = {code: n for code, n in Counter(codes).items() if n > 1}
+    print(f"workers={args.workers} vouchers={args.vouchers} claimed={len(codes)} "
+          f"unique={len(set(codes))} duplicates={len(duplicates)} "
+          f"elapsed={elapsed:.2f}s rate={len(codes) / elapsed:.0f}/s")
+
+    if duplicates:
+        print(f"FAIL: double allocations: {sorted(duplicates)[:20]}")
+        return 1
+    if len(codes) != args.vouchers:
+        print(f"FAIL: {args.vouchers - len(codes)} vouchers were never allocated")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
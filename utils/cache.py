@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from loguru import logger
+
+from utils.metrics import Counter, Gauge
+
+cache_requests_total = Counter("cache_requests_total", "In-process cache lookups", ["cache", "result"])
+cache_entries = Gauge("cache_entries", "Entries held by in-process caches", ["cache"])
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire ``ttl`` seconds after being set."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                cache_requests_total.inc(cache=self.name, result="hit")
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            cache_requests_total.inc(cache=self.name, result="miss")
+            return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            cache_entries.set(len(self._entries), cache=self.name)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            cache_entries.set(len(self._entries), cache=self.name)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            cache_entries.set(0, cache=self.name)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses}
+
+
+class RevocationList:
+    """Thread-safe in-memory set of revoked token ids plus per-subject revocation times.
+
+    Token ids are kept only until the token would have expired anyway, so the
+    list stays bounded by the number of tokens revoked within one token lifetime.
+    """
+
+    def __init__(self) -> None:
+        self._tokens: dict[str, float] = {}
+        self._subjects: dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+    def revoke_token(self, jti: str, expires_at: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._tokens[jti] = expires_at
+            if len(self._tokens) % 1000 == 0:
+                self._tokens = {k: v for k, v in self._tokens.items() if v > now}
+
+    def revoke_subject(self, subject: Hashable, revoked_at: Optional[float] = None) -> None:
+        """Reject every token issued to ``subject`` before ``revoked_at``."""
+        with self._lock:
+            self._subjects[subject] = max(self._subjects.get(subject, 0.0), revoked_at or time.time())
+
+    def is_revoked(self, jti: Optional[str], subject: Hashable, issued_at: float) -> bool:
+        with self._lock:
+            if jti is not None and jti in self._tokens:
+                return True
+            return issued_at <= self._subjects.get(subject, 0.0)
+
+    def stats(self) -> dict:
+        return {"tokens": len(self._tokens), "subjects": len(self._subjects)}
+
+
+class RedisInvalidationChannel:
+    """Broadcasts cache invalidations to every worker process through Redis pub/sub.
+
+    Optional: without a Redis URL each process only invalidates its own cache
+    and other workers converge when their entries expire. ``on_invalidate`` runs
+    for every key, local or received, next to (or instead of) the cache eviction.
+    """
+
+    def __init__(self, cache: Optional[TTLCache], redis_url: Optional[str], channel: str,
+                 on_invalidate: Optional[Callable[[Any], None]] = None) -> None:
+        self.cache = cache
+        self.redis_url = redis_url
+        self.channel = channel
+        self.on_invalidate = on_invalidate
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(self.redis_url)
+        return self._client
+
+    def _apply(self, key: Any) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(key)
+        if self.on_invalidate is not None:
+            self.on_invalidate(key)
+
+    def publish(self, key: Hashable) -> None:
+        self._apply(key)
+        if not self.redis_url:
+            return
+        try:
+            self._get_client().publish(self.channel, str(key))
+        except Exception as e:
+            logger.error(f"Channel {self.channel}: failed to publish invalidation for {key}: {str(e)}")
+
+    async def listen(self, parse_key=str) -> None:
+        """Apply invalidations published by other workers until cancelled."""
+        if not self.redis_url:
+            return
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.Redis.from_url(self.redis_url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # Anything cached while we were disconnected may be stale
+                    if self.cache is not None:
+                        self.cache.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._apply(parse_key(message["data"].decode()))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Channel {self.channel}: invalidation listener error: {str(e)}, reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from loguru import logger
+from passlib.context import CryptContext
+
+from config.setting import app_settings
+from utils.metrics import Counter, Gauge, Histogram
+from utils.request_threads import follow
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=app_settings.BCRYPT_ROUNDS)
+
+password_hash_seconds = Histogram(
+    "password_hash_seconds", "Time spent hashing or verifying a password in the pool", ["operation"])
+password_queue_depth = Gauge("password_queue_depth", "Password operations queued or running")
+password_rejected_total = Counter(
+    "password_rejected_total", "Password operations refused because the queue was full")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_slots: Optional[threading.BoundedSemaphore] = None
+
+
+class PasswordHasherBusy(Exception):
+    """The password pool queue is full; the caller should retry later."""
+
+
+def _worker_count() -> int:
+    return app_settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # bcrypt releases the GIL while hashing, so threads run it in parallel
+                _slots = threading.BoundedSemaphore(_worker_count() + app_settings.PASSWORD_HASH_MAX_PENDING)
+                _executor = ThreadPoolExecutor(max_workers=_worker_count(), thread_name_prefix="password")
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _timed(operation: str, func, *args):
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        password_hash_seconds.observe(time.perf_counter() - started, operation=operation)
+
+
+def _submit(operation: str, func, *args) -> Future:
+    """Queue a password operation, refusing it when the queue is already full."""
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        password_rejected_total.inc()
+        logger.warning(f"Password pool saturated, rejecting {operation}")
+        raise PasswordHasherBusy(operation)
+    password_queue_depth.inc()
+
+    def release(_):
+        password_queue_depth.dec()
+        _slots.release()
+
+    try:
+        future = executor.submit(follow(_timed), operation, func, *args)
+    except BaseException:
+        release(None)
+        raise
+    future.add_done_callback(release)
+    return future
+
+
+async def hash_password(password: str) -> str:
+    return await asyncio.wrap_future(_submit("hash", pwd_context.hash, password))
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Check a password; also returns a new hash when the stored one uses outdated parameters."""
+    return await asyncio.wrap_future(
+        _submit("verify", pwd_context.verify_and_update, password, hashed_password))
+
+
+async def dummy_verify() -> None:
+    """Spend the same time as a real check so unknown usernames are not revealed by timing."""
+    await asyncio.wrap_future(_submit("verify", pwd_context.dummy_verify))
+
+
+def hash_password_sync(password: str) -> str:
+    return _submit("hash", pwd_context.hash, password).result()
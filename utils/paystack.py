@@ -0,0 +1,159 @@
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+from loguru import logger
+
+from config.setting import app_settings
+from utils.metrics import Counter, Histogram
+
+load_dotenv()
+PAYSTACK_URL = os.getenv("PAYSTACK_URL")
+
+PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY")
+
+# Errors raised before the request reached Paystack; safe to retry for any method.
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+paystack_request_seconds = Histogram(
+    "paystack_request_seconds", "Paystack API call latency", ["operation", "outcome"])
+paystack_requests_total = Counter(
+    "paystack_requests_total", "Paystack API calls by HTTP status", ["operation", "status"])
+paystack_retries_total = Counter(
+    "paystack_retries_total", "Paystack API call retries", ["operation"])
+
+
+class PaystackError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None, body: str = "") -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class PaystackClient:
+    """Keep-alive Paystack client shared by the buy, complete, webhook and
+    reconciliation flows.
+
+    Sync only: every caller runs in the thread pool on the sync engine, so the
+    calls never block the event loop. Every call has a timeout. GETs are retried
+    on transport errors, 429 and 5xx; POSTs only when the connection was never
+    established, so a transaction is never initialized twice. Retries back off
+    exponentially with full jitter. A 200 whose body is not JSON, or lacks the
+    fields the caller needs, raises PaystackError like any other failure.
+    """
+
+    def __init__(
+            self,
+            base_url: str = PAYSTACK_URL,
+            secret_key: str = PAYSTACK_SECRET_KEY,
+            timeout: float = app_settings.PAYSTACK_TIMEOUT_SECONDS,
+            connect_timeout: float = app_settings.PAYSTACK_CONNECT_TIMEOUT_SECONDS,
+            max_retries: int = app_settings.PAYSTACK_MAX_RETRIES,
+            backoff: float = app_settings.PAYSTACK_RETRY_BACKOFF_SECONDS,
+            pool_size: int = app_settings.PAYSTACK_POOL_SIZE,
+    ) -> None:
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._headers = {
+            "Authorization": f"Bearer {secret_key}",
+            "Content-Type": "application/json"
+        }
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._client: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+
+    def _get_client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        base_url=self.base_url or "", headers=self._headers,
+                        timeout=self._timeout, limits=self._limits)
+        return self._client
+
+    def _retry_delay(self, attempt: int) -> float:
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _should_retry(self, method: str, attempt: int, error: Optional[Exception] = None,
+                      response: Optional[httpx.Response] = None) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if error is not None:
+            return method == "GET" or isinstance(error, CONNECT_ERRORS)
+        return method == "GET" and response.status_code in RETRYABLE_STATUS_CODES
+
+    @staticmethod
+    def _record(operation: str, started: float, outcome: str, status: str) -> None:
+        paystack_request_seconds.observe(time.perf_counter() - started, operation=operation, outcome=outcome)
+        paystack_requests_total.inc(operation=operation, status=status)
+
+    @staticmethod
+    def _parse(operation: str, response: httpx.Response, fields: tuple) -> dict:
+        """The decoded body; its ``data`` object must carry ``fields``."""
+        if response.status_code != 200:
+            raise PaystackError(f"Paystack {operation} failed with status {response.status_code}",
+                                status_code=response.status_code, body=response.text)
+        try:
+            body = response.json()
+        except ValueError as e:
+            raise PaystackError(f"Paystack {operation} returned invalid JSON",
+                                status_code=response.status_code, body=response.text) from e
+        data = body.get("data") if isinstance(body, dict) else None
+        missing = [field for field in fields if field not in data] if isinstance(data, dict) else ["data"]
+        if missing:
+            raise PaystackError(f"Paystack {operation} response is missing {', '.join(missing)}",
+                                status_code=response.status_code, body=response.text)
+        return body
+
+    def _request(self, operation: str, method: str, path: str, fields: tuple = (), **kwargs) -> dict:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self._get_client().request(method, path, **kwargs)
+            except httpx.HTTPError as e:
+                self._record(operation, started, "error", type(e).__name__)
+                if not self._should_retry(method, attempt, error=e):
+                    raise PaystackError(f"Paystack {operation} request failed: {str(e)}") from e
+                logger.warning(f"Paystack {operation} attempt {attempt + 1} failed: {str(e)}, retrying")
+            else:
+                self._record(operation, started, "ok" if response.status_code == 200 else "error",
+                             str(response.status_code))
+                if not self._should_retry(method, attempt, response=response):
+                    return self._parse(operation, response, fields)
+                logger.warning(f"Paystack {operation} attempt {attempt + 1} returned "
+                               f"{response.status_code}, retrying")
+            paystack_retries_total.inc(operation=operation)
+            time.sleep(self._retry_delay(attempt))
+            attempt += 1
+
+    @staticmethod
+    def _initialize_payload(amount: float, email: str, currency: str) -> dict:
+        return {
+            "amount": int(amount * 100),  # Convert to pesewas
+            "email": email,
+            "currency": currency
+        }
+
+    def initialize_transaction(self, amount: float, email: str, currency: str = "GHS") -> dict:
+        return self._request("initialize", "POST", "/initialize",
+                             fields=("authorization_url", "access_code", "reference"),
+                             json=self._initialize_payload(amount, email, currency))
+
+    def verify_transaction(self, reference: str) -> dict:
+        return self._request("verify", "GET", f"/verify/{reference}", fields=("status",))
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+paystack_client = PaystackClient()
@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Iterator, List, Optional, Tuple, Union
+
+import pdfplumber
+
+from config.setting import app_settings
+
+VOUCHER_CODE_PATTERN = re.compile(r"\b[a-z0-9]{6}\b", re.MULTILINE)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _worker_count() -> int:
+    return app_settings.PDF_EXTRACT_WORKERS or os.cpu_count() or 1
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: the parent runs threads and an event loop, which fork does not copy safely
+                _executor = ProcessPoolExecutor(
+                    max_workers=_worker_count(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def extract_page_range(pdf_source: Union[bytes, str], start: int, stop: int) -> List[List[str]]:
+    """Voucher codes on pages ``start``..``stop - 1``, one list per page.
+
+    ``pdf_source`` is the document itself or the path of a file holding it.
+    """
+    codes = []
+    with pdfplumber.open(BytesIO(pdf_source) if isinstance(pdf_source, bytes) else pdf_source) as pdf:
+        for page in pdf.pages[start:stop]:
+            codes.append(VOUCHER_CODE_PATTERN.findall(page.extract_text() or ""))
+            page.close()  # drop the parsed layout before moving on
+    return codes
+
+
+def count_pages(pdf_contents: bytes) -> int:
+    with pdfplumber.open(BytesIO(pdf_contents)) as pdf:
+        return len(pdf.pages)
+
+
+def iter_voucher_codes(pdf_contents: bytes, page_count: Optional[int] = None) -> Iterator[Tuple[int, List[str]]]:
+    """Yield ``(page_number, codes)`` for every page, in page order.
+
+    Small documents are parsed inline. Larger ones are written to a temporary
+    file once and split into page ranges that pool workers parse from that
+    file, so the document is not pickled to a worker per range; at most two
+    ranges per worker are in flight at once. Pass ``page_count`` when the
+    caller has already counted the pages.
+    """
+    if page_count is None:
+        page_count = count_pages(pdf_contents)
+    step = app_settings.PDF_PAGES_PER_TASK
+    if page_count < app_settings.PDF_PARALLEL_MIN_PAGES:
+        for offset, codes in enumerate(extract_page_range(pdf_contents, 0, page_count)):
+            yield offset + 1, codes
+        return
+
+    executor = _get_executor()
+    ranges = deque(range(0, page_count, step))
+    in_flight = deque()
+    max_in_flight = 2 * _worker_count()
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
+        pdf_file.write(pdf_contents)
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < max_in_flight:
+                start = ranges.popleft()
+                in_flight.append((start, executor.submit(
+                    extract_page_range, pdf_file.name, start, min(start + step, page_count))))
+            start, future = in_flight.popleft()
+            for offset, codes in enumerate(future.result()):
+                yield start + offset + 1, codes
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+        # Workers still parsing a cancelled range keep their open handle; unlinking is safe on POSIX
+        try:
+            os.unlink(pdf_file.name)
+        except OSError:
+            pass
@@ -0,0 +1,173 @@
+"""Sampling profiler for individual requests and a bounded store of the results.
+
+cProfile only sees the thread it is enabled in, while a slow purchase or upload
+spends its time in the thread pool, the bcrypt pool or waiting on Postgres and
+Paystack. The sampler instead snapshots the Python stacks of the request's own
+threads every PROFILE_INTERVAL_SECONDS and counts, per function, the samples in
+which it was running (self) or on the stack (total). Those threads are the event
+loop and the request's ``utils.request_threads`` group: the thread-pool worker
+running a sync endpoint and pool threads entered through ``follow()``. Other
+requests' pool threads, the scheduler and the webhook and upload workers
+are left out; the event loop is shared, so profiles record how many other
+requests were in flight. Idle threads parked in ``threading``/``selectors``/
+``queue`` waits are skipped.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+from config.setting import app_settings
+from utils.request_threads import ThreadGroup
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_STDLIB_ROOT = os.path.dirname(os.__file__)
+_IDLE_MODULES = ("threading.py", "selectors.py", "queue.py")
+
+
+def _is_idle(code) -> bool:
+    return code.co_filename.endswith(_IDLE_MODULES) or (
+        code.co_name == "_worker" and code.co_filename.endswith(os.path.join("concurrent", "futures", "thread.py")))
+
+
+def describe(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = os.path.relpath(filename, _PROJECT_ROOT)
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    elif filename.startswith(_STDLIB_ROOT):
+        filename = os.path.relpath(filename, _STDLIB_ROOT)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the stacks of one request's threads from a daemon thread between start() and stop()."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self.started = 0.0
+        self.started_at: Optional[datetime] = None
+        self.concurrent_requests = 0
+        # Threads working for the request, set as current_thread_group while it runs
+        self.threads = ThreadGroup()
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Called on the event loop thread serving the request."""
+        self.started, self.started_at = time.perf_counter(), datetime.now()
+        self._loop_thread = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.concurrent_requests = max(self.concurrent_requests, _requests_in_flight - 1)
+            for ident, frame in sys._current_frames().items():
+                if ident == self._loop_thread or ident in self.threads:
+                    self._record(frame)
+
+    def _record(self, frame) -> None:
+        if _is_idle(frame.f_code):
+            return
+        self.samples += 1
+        self.self_counts[frame.f_code] += 1
+        seen = set()
+        while frame is not None:
+            if frame.f_code not in seen:
+                seen.add(frame.f_code)
+                self.total_counts[frame.f_code] += 1
+            frame = frame.f_back
+
+    def top(self, limit: int) -> list:
+        """The ``limit`` hottest functions by self samples, with their share of total time."""
+        return [
+            {
+                "function": describe(code),
+                "self_samples": count,
+                "total_samples": self.total_counts[code],
+                "self_ms": round(count * self.interval * 1000, 1),
+                "total_ms": round(self.total_counts[code] * self.interval * 1000, 1),
+            }
+            for code, count in self.self_counts.most_common(limit)
+        ]
+
+
+class ProfileStore:
+    """The last PROFILE_RING_SIZE profiles of each route, newest last."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._profiles: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, route: str, profile: dict) -> None:
+        with self._lock:
+            ring = self._profiles.get(route)
+            if ring is None:
+                ring = self._profiles[route] = deque(maxlen=self.size)
+            ring.append(profile)
+
+    def get(self, route: Optional[str] = None) -> dict:
+        with self._lock:
+            return {name: list(ring) for name, ring in self._profiles.items() if route in (None, name)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore(app_settings.PROFILE_RING_SIZE)
+# The event loop thread is shared by every request, so only one request is profiled at a time
+_profiling_lock = threading.Lock()
+# HTTP requests this process is serving, kept by ProfilingMiddleware on the event loop
+_requests_in_flight = 0
+
+
+@contextmanager
+def request_in_flight() -> Iterator[None]:
+    global _requests_in_flight
+    _requests_in_flight += 1
+    try:
+        yield
+    finally:
+        _requests_in_flight -= 1
+
+
+def try_start_profiler() -> Optional[SamplingProfiler]:
+    """A running profiler, or None while another request is being profiled."""
+    if not _profiling_lock.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler(app_settings.PROFILE_INTERVAL_SECONDS)
+    profiler.start()
+    return profiler
+
+
+def finish_profiler(profiler: SamplingProfiler, route: str, method: str, status_code: int, trigger: str) -> None:
+    try:
+        profiler.stop()
+    finally:
+        _profiling_lock.release()
+    profile_store.add(f"{method} {route}", {
+        "started_at": profiler.started_at,
+        "duration_ms": round((time.perf_counter() - profiler.started) * 1000, 1),
+        "status": status_code,
+        "trigger": trigger,
+        "samples": profiler.samples,
+        # Other requests share the event loop, so its samples may include their work
+        "concurrent_requests": profiler.concurrent_requests,
+        "functions": profiler.top(app_settings.PROFILE_TOP_N),
+    })
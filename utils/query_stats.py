@@ -0,0 +1,106 @@
+"""Per-request SQL statement counts and timings from SQLAlchemy engine events.
+
+The listeners are attached to every ``Engine`` (the async engines run on a sync
+engine underneath), so primary, replica, sync and async queries are all seen.
+A request's totals live in a ``QueryStats`` held in a contextvar that
+``QueryStatsMiddleware`` sets; the object is shared with the thread pool, so
+queries from sync endpoints count towards the same request.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config.setting import app_settings
+
+
+class QueryStats:
+    def __init__(self, scope: Optional[dict] = None) -> None:
+        self.scope = scope
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Optional[List[str]] = None
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.duration += elapsed
+            if self.statements is not None:
+                self.statements.append(statement)
+
+
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+# Process-wide collectors opened by count_queries(), fed from every thread
+_collectors: List[QueryStats] = []
+_collectors_lock = threading.Lock()
+
+
+def _route(stats: Optional[QueryStats]) -> str:
+    if stats is None or stats.scope is None:
+        return "background"
+    # Imported here: core.middleware imports this module
+    from core.middleware import route_template
+    return f"{stats.scope['method']} {route_template(stats.scope)}"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    if _collectors:
+        with _collectors_lock:
+            for collector in _collectors:
+                collector.record(statement, elapsed)
+    if app_settings.SLOW_QUERY_SECONDS and elapsed >= app_settings.SLOW_QUERY_SECONDS:
+        logger.warning(f"Database: Slow query ({elapsed * 1000:.1f}ms) in {_route(stats)}: "
+                       f"{' '.join(statement.split())[:500]}")
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # The failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Collect every statement run in this process, from any thread, while the block runs."""
+    collector = QueryStats()
+    collector.statements = []
+    with _collectors_lock:
+        _collectors.append(collector)
+    try:
+        yield collector
+    finally:
+        with _collectors_lock:
+            _collectors.remove(collector)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, label: str = "block") -> Iterator[QueryStats]:
+    """Fail with the statements listed when the block runs more than ``max_queries``.
+
+        with assert_max_queries(3, "GET /api/v1/voucher"):
+            client.get("/api/v1/voucher", headers=headers)
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = "\n".join(f"  {' '.join(statement.split())[:200]}" for statement in stats.statements)
+        raise AssertionError(f"{label} ran {stats.count} queries, expected at most {max_queries}:\n{statements}")
@@ -0,0 +1,82 @@
+"""The threads doing work for the current request.
+
+A ``ThreadGroup`` in ``current_thread_group`` collects them: routes built with
+``ThreadTaggingRoute`` register the thread-pool worker running a sync endpoint,
+and pools that do not carry the context along register theirs through
+``follow()``. The request profiler samples only the threads in its group.
+"""
+import asyncio
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Iterator, Optional
+
+from fastapi.routing import APIRoute
+
+
+class ThreadGroup:
+    """Idents of the threads currently working for one request."""
+
+    def __init__(self) -> None:
+        self._threads: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def __contains__(self, ident: int) -> bool:
+        return ident in self._threads
+
+    @contextmanager
+    def joined(self) -> Iterator[None]:
+        """Count the calling thread in the group until the block exits."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads[ident] -= 1
+                if not self._threads[ident]:
+                    del self._threads[ident]
+
+
+# Set only while something (the profiler) wants to know; copied into the thread pool with the context
+current_thread_group: ContextVar[Optional[ThreadGroup]] = ContextVar("current_thread_group", default=None)
+
+
+def follow(func: Callable) -> Callable:
+    """``func``, counted in the current request's thread group in whichever pool thread runs it.
+
+    For work handed to a thread pool that does not carry the context along.
+    """
+    group = current_thread_group.get()
+    if group is None:
+        return func
+
+    def run(*args, **kwargs):
+        with group.joined():
+            return func(*args, **kwargs)
+    return run
+
+
+def tag_thread(func: Callable) -> Callable:
+    """``func``, counting the thread it runs in towards the group in its (copied) context."""
+
+    @wraps(func)
+    def run(*args, **kwargs):
+        group = current_thread_group.get()
+        if group is None:
+            return func(*args, **kwargs)
+        with group.joined():
+            return func(*args, **kwargs)
+    return run
+
+
+class ThreadTaggingRoute(APIRoute):
+    """Registers the thread-pool worker running a sync endpoint with the request's thread group."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs) -> None:
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = tag_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
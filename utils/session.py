@@ -1,18 +1,136 @@
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from config.setting import app_settings
 from core import setup
+from utils.cache import TTLCache
+from utils.metrics import Counter
+
+db_reads_total = Counter("db_reads_total", "Read-only sessions by the database serving them", ["target", "reason"])
+
+# Authenticated user of the current request, set by get_current_user
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+# Users who committed a write recently; their reads stay on the primary until it expires.
+# Per worker process: ReadAfterWriteMiddleware carries the pin to the other workers.
+recent_writers = TTLCache("read_after_write", app_settings.READ_AFTER_WRITE_CACHE_SIZE,
+                          app_settings.READ_AFTER_WRITE_SECONDS)
+
+
+class ReadAfterWrite:
+    """Read-after-write state of one request, shared with its thread-pool work like QueryStats."""
+
+    def __init__(self, pinned: bool = False) -> None:
+        self.pinned = pinned  # the client sent back a valid pin from an earlier write
+        self.wrote = False  # this request committed a write
+
+
+current_read_after_write: ContextVar[Optional[ReadAfterWrite]] = ContextVar("current_read_after_write", default=None)
+
+
+def _pinned_to_primary() -> bool:
+    state = current_read_after_write.get()
+    if state is not None and (state.pinned or state.wrote):
+        return True
+    user_id = current_user_id.get()
+    return user_id is not None and recent_writers.get(user_id) is not None
+
+
+def _route_read(replica_session):
+    """Count where a read-only session went; None means the primary."""
+    if replica_session is None:
+        db_reads_total.inc(target="primary", reason="replica_lag")
+    else:
+        db_reads_total.inc(target="replica", reason="ok")
+    return replica_session
+
+
+def _track_writes() -> None:
+    """Remember the request and its user when a session commits an INSERT/UPDATE/DELETE."""
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _statement_writes(orm_execute_state):
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            orm_execute_state.session.info["wrote"] = True
 
+    @event.listens_for(Session, "after_flush")
+    def _flush_writes(session, flush_context):
+        session.info["wrote"] = True
+
+    @event.listens_for(Session, "after_commit")
+    def _remember_writer(session):
+        if not session.info.pop("wrote", False):
+            return
+        state = current_read_after_write.get()
+        if state is not None:
+            state.wrote = True
+        user_id = current_user_id.get()
+        if user_id is not None:
+            recent_writers.set(user_id, True)
+
+    @event.listens_for(Session, "after_rollback")
+    def _forget_writes(session):
+        session.info.pop("wrote", None)
+
+
+if setup.database.has_replica() or setup.async_database.has_replica():
+    _track_writes()
 
 
 class SessionManager:
-    def __init__(self) -> None:
-        self.db_init = setup.DatabaseSetup()
-        self.db = self.db_init.get_session()
-        
-    
+    def __init__(self, read_only: bool = False) -> None:
+        """``read_only`` sessions may be served by the read replica."""
+        self.db = setup.database.get_session()
+        self.read_only = read_only
+        self._session: Optional[Session] = None
+
+
     def __enter__(self) -> Session:
-        return self.db()
-    
-    
+        session_maker = self.db
+        if self.read_only and setup.database.has_replica():
+            if _pinned_to_primary():
+                db_reads_total.inc(target="primary", reason="read_after_write")
+            else:
+                session_maker = _route_read(setup.database.get_read_session()) or self.db
+        self._session = session_maker()
+        return self._session
+
+
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.db().close()
+        try:
+            if exc_type is not None:
+                self._session.rollback()
+        finally:
+            self._session.close()
+            self._session = None
+
+
+class AsyncSessionManager:
+    def __init__(self, read_only: bool = False) -> None:
+        """``read_only`` sessions may be served by the read replica."""
+        self.db = setup.async_database.get_session()
+        self.read_only = read_only
+        self._session: Optional[AsyncSession] = None
+
+
+    async def __aenter__(self) -> AsyncSession:
+        session_maker = self.db
+        if self.read_only and setup.async_database.has_replica():
+            if _pinned_to_primary():
+                db_reads_total.inc(target="primary", reason="read_after_write")
+            else:
+                session_maker = _route_read(await setup.async_database.get_read_session()) or self.db
+        self._session = session_maker()
+        return self._session
+
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        try:
+            if exc_type is not None:
+                await self._session.rollback()
+        finally:
+            await self._session.close()
+            self._session = None
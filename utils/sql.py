@@ -0,0 +1,337 @@
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import DateTime, case, delete, func, insert, literal, select, text, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models.user import User
+from models.voucher import Voucher
+from models.voucher_history import VoucherHistory
+from models.voucher_stock import VoucherStock
+from schemas.voucher import VoucherFilter
+
+ALLOCATION_ATTEMPTS = 10
+BULK_INSERT_CHUNK_SIZE = 1000
+STOCK_BUCKETS = ("free", "held", "sold")
+
+# Columns returned by listings; rows are serialized without loading ORM objects
+VOUCHER_COLUMNS = (
+    Voucher.id,
+    Voucher.code,
+    Voucher.value,
+    Voucher.amount,
+    Voucher.validity_days,
+    Voucher.purchased_date,
+    Voucher.reference,
+    Voucher.user_id,
+    Voucher.is_used,
+    Voucher.is_reserved,
+    Voucher.reserved_until,
+    Voucher.is_expired,
+)
+
+# Columns of UserOut; listings never load password hashes
+USER_COLUMNS = (
+    User.id,
+    User.full_name,
+    User.username,
+    User.email,
+    User.is_active,
+    User.is_admin,
+)
+
+UPSERT_INSERTS = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+def claim_row(db: Session, model, criteria: list, values: dict, order_by=None,
+              before_commit: Optional[Callable[[Session, int], None]] = None) -> Optional[int]:
+    """Atomically claim one ``model`` row matching ``criteria`` and apply ``values`` to it.
+
+    The candidate row is picked with ``SELECT ... FOR UPDATE SKIP LOCKED`` so
+    concurrent callers each lock a different row instead of queueing behind (or
+    sharing) the same one. The UPDATE repeats ``criteria``, so a row that was
+    claimed in the meantime (backends without row locks) is never handed out
+    twice; the caller just retries on the next candidate. Commits on success
+    (after ``before_commit``, which joins the same transaction) and returns the
+    claimed id, or None when nothing matches.
+    """
+    for _ in range(ALLOCATION_ATTEMPTS):
+        row_id = db.execute(
+            select(model.id)
+            .where(*criteria)
+            .order_by(order_by if order_by is not None else model.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar()
+        if row_id is None:
+            db.rollback()
+            return None
+
+        result = db.execute(
+            update(model)
+            .where(model.id == row_id, *criteria)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            if before_commit is not None:
+                before_commit(db, row_id)
+            db.commit()
+            return row_id
+        db.rollback()
+    return None
+
+
+def allocate_voucher(db: Session, criteria: list, values: dict,
+                     stock_move: Optional[tuple] = None) -> Optional[Voucher]:
+    """Claim one voucher matching ``criteria`` (see ``claim_row``) and return it.
+
+    ``stock_move`` is a ``(from_bucket, to_bucket)`` pair applied to the
+    voucher_stock counters in the same transaction.
+    """
+    def move_stock(db: Session, voucher_id: int) -> None:
+        amount = db.execute(select(Voucher.amount).where(Voucher.id == voucher_id)).scalar()
+        db.execute(stock_adjustment(db, amount, **{stock_move[0]: -1, stock_move[1]: 1}))
+
+    voucher_id = claim_row(db, Voucher, criteria, values,
+                           before_commit=move_stock if stock_move is not None else None)
+    if voucher_id is None:
+        return None
+    return db.get(Voucher, voucher_id)
+
+
+def inventory_query():
+    """Free / held / sold voucher counts per denomination."""
+    held = (Voucher.is_used == False) & (Voucher.is_reserved == True)
+    free = (Voucher.is_used == False) & (Voucher.is_reserved.isnot(True))
+    return (
+        select(
+            Voucher.amount,
+            func.sum(case((free, 1), else_=0)).label("free"),
+            func.sum(case((held, 1), else_=0)).label("held"),
+            func.sum(case((Voucher.is_used == True, 1), else_=0)).label("sold"),
+        )
+        .group_by(Voucher.amount)
+        .order_by(Voucher.amount)
+    )
+
+
+def release_expired_reservations_statement(now: datetime):
+    """Bulk UPDATE returning every expired, unpaid hold to free stock; yields each row's amount."""
+    return (
+        update(Voucher)
+        .where(
+            Voucher.is_reserved == True,
+            Voucher.is_used == False,
+            Voucher.reserved_until < now,
+        )
+        .values(is_reserved=False, reserved_until=None, user_id=None, reference=None)
+        .returning(Voucher.amount)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def expire_vouchers_statement(validity_days: int, now: datetime):
+    """Bulk UPDATE flagging sold vouchers of this validity whose validity has run out."""
+    return (
+        update(Voucher)
+        .where(
+            Voucher.is_used == True,
+            Voucher.is_expired.isnot(True),
+            Voucher.validity_days == validity_days,
+            Voucher.purchased_date < now - timedelta(days=validity_days),
+        )
+        .values(is_expired=True)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def stock_bucket(is_used: Optional[bool], is_reserved: Optional[bool]) -> str:
+    """The voucher_stock counter a voucher in this state is counted under."""
+    if is_used:
+        return "sold"
+    return "held" if is_reserved else "free"
+
+
+def stock_adjustment(db, amount: float, **deltas: int):
+    """Statement adding ``deltas`` (bucket -> change) to the stock row for ``amount``.
+
+    Works for sync and async sessions; execute it in the transaction that
+    changes the vouchers so counters and rows commit together.
+    """
+    upsert_insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if upsert_insert is None:
+        # No upsert: rows for new amounts appear on the next rebuild_stock
+        return (
+            update(VoucherStock)
+            .where(VoucherStock.amount == amount)
+            .values({bucket: getattr(VoucherStock, bucket) + delta for bucket, delta in deltas.items()})
+        )
+    statement = upsert_insert(VoucherStock).values(
+        amount=amount, **{bucket: deltas.get(bucket, 0) for bucket in STOCK_BUCKETS})
+    return statement.on_conflict_do_update(
+        index_elements=[VoucherStock.amount],
+        set_={bucket: getattr(VoucherStock, bucket) + statement.excluded[bucket] for bucket in deltas},
+    )
+
+
+def count_by_amount(amounts) -> dict:
+    counts = {}
+    for amount in amounts:
+        counts[amount] = counts.get(amount, 0) + 1
+    return counts
+
+
+def rebuild_stock(db: Session) -> tuple:
+    """Recount voucher_stock from the vouchers table, one denomination per transaction.
+
+    Returns ``(stock, previous)``: the new rows and the counters they replace,
+    keyed by amount. Each denomination's counter row is locked before its
+    vouchers are counted: writers that already touched the row commit first and
+    are included, later ones wait for this one short count and then apply
+    their change on top. Other denominations are never blocked. Commits.
+    """
+    amounts = set(db.execute(select(Voucher.amount).where(Voucher.amount.isnot(None)).distinct()).scalars())
+    amounts.update(db.execute(select(VoucherStock.amount)).scalars())
+    db.commit()
+
+    stock, previous = [], {}
+    for amount in sorted(amounts):
+        existed = db.execute(select(VoucherStock.amount).where(VoucherStock.amount == amount)).first()
+        # A no-op upsert creates a missing row and takes its lock
+        db.execute(stock_adjustment(db, amount, free=0))
+        row = db.execute(select(VoucherStock).where(VoucherStock.amount == amount).with_for_update()).scalar()
+        if existed and row is not None:
+            previous[amount] = row.to_dict()
+        counts = db.execute(inventory_query().where(Voucher.amount == amount)).first()
+        if counts is None:
+            db.execute(delete(VoucherStock).where(VoucherStock.amount == amount))
+        else:
+            values = {"free": counts.free or 0, "held": counts.held or 0, "sold": counts.sold or 0}
+            if row is None:
+                db.execute(insert(VoucherStock).values(amount=amount, **values))
+            else:
+                db.execute(update(VoucherStock).where(VoucherStock.amount == amount).values(**values))
+            stock.append({"amount": amount, **values})
+        db.commit()
+    return stock, previous
+
+
+def bulk_insert_vouchers(db: Session, codes: list, values: dict,
+                         chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> set:
+    """Insert one voucher per code in chunked multi-row INSERTs; returns the inserted codes.
+
+    Codes that already exist are skipped. Where the backend supports it this is
+    ``INSERT ... ON CONFLICT (code) DO NOTHING RETURNING code``, which also
+    covers concurrent uploads of the same code; otherwise existing codes are
+    filtered with one ``IN`` query per chunk. Does not commit.
+    """
+    upsert_insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    inserted = set()
+    for start in range(0, len(codes), chunk_size):
+        chunk = codes[start:start + chunk_size]
+        rows = [{"code": code, **values} for code in chunk]
+        if upsert_insert is not None:
+            statement = (
+                upsert_insert(Voucher)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=[Voucher.code])
+                .returning(Voucher.code)
+            )
+            inserted.update(db.execute(statement).scalars())
+            continue
+
+        existing = set(db.execute(select(Voucher.code).where(Voucher.code.in_(chunk))).scalars())
+        new_rows = [row for row in rows if row["code"] not in existing]
+        if new_rows:
+            db.execute(insert(Voucher), new_rows)
+            inserted.update(row["code"] for row in new_rows)
+    return inserted
+
+
+def voucher_filter_criteria(filters: VoucherFilter) -> list:
+    criteria = []
+    if filters.amount is not None:
+        criteria.append(Voucher.amount == filters.amount)
+    if filters.is_used is not None:
+        criteria.append(Voucher.is_used == filters.is_used)
+    if filters.user_id is not None:
+        criteria.append(Voucher.user_id == filters.user_id)
+    if filters.purchased_from is not None:
+        criteria.append(Voucher.purchased_date >= filters.purchased_from)
+    if filters.purchased_to is not None:
+        criteria.append(Voucher.purchased_date < filters.purchased_to)
+    return criteria
+
+
+def voucher_page_query(criteria: list, after_id: Optional[int], limit: int):
+    """Keyset page on ``id``: rows after ``after_id``, plus one extra row to detect a next page."""
+    query = select(*VOUCHER_COLUMNS).where(*criteria).order_by(Voucher.id).limit(limit + 1)
+    if after_id is not None:
+        query = query.where(Voucher.id > after_id)
+    return query
+
+
+def voucher_count_query(criteria: list):
+    return select(func.count()).select_from(Voucher).where(*criteria)
+
+
+# Planner row estimate; avoids a full scan when the listing is unfiltered.
+# reltuples is -1 until the table has been analyzed.
+POSTGRESQL_ESTIMATED_COUNT = text(
+    "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)"
+).bindparams(table_name=Voucher.__tablename__)
+
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def voucher_export_query(criteria: list):
+    """All matching vouchers in id order, streamed from a server-side cursor."""
+    return (
+        select(*VOUCHER_COLUMNS)
+        .where(*criteria)
+        .order_by(Voucher.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+
+def archive_used_vouchers_batch(db: Session, criteria: list, batch_size: int) -> int:
+    """Move up to ``batch_size`` sold vouchers matching ``criteria`` into voucher_history.
+
+    One short transaction per call: the batch is locked with SKIP LOCKED (so a
+    concurrent archiver takes a different batch), copied, deleted and taken
+    off the sold counters, then committed. Returns the number archived.
+    """
+    voucher_ids = db.execute(
+        select(Voucher.id)
+        .where(Voucher.is_used == True, *criteria)
+        .order_by(Voucher.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not voucher_ids:
+        db.rollback()
+        return 0
+
+    db.execute(
+        insert(VoucherHistory).from_select(
+            [column.key for column in VOUCHER_COLUMNS] + ["archived_at"],
+            select(*VOUCHER_COLUMNS, literal(datetime.now(), DateTime)).where(Voucher.id.in_(voucher_ids)),
+        )
+    )
+    amounts = db.execute(
+        delete(Voucher)
+        .where(Voucher.id.in_(voucher_ids))
+        .returning(Voucher.amount)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    for amount, archived in count_by_amount(amounts).items():
+        db.execute(stock_adjustment(db, amount, sold=-archived))
+    db.commit()
+    return len(amounts)